@@ -0,0 +1,185 @@
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import time
+
+import numpy as np
+
+from controllers import diagnose_controller
+from controllers.diagnose_controller import model_specs, model_loader, model_path, predict_all
+from services.model_registry import ModelRegistry
+from services.prediction_cache import prediction_cache
+
+# plausible ranges for the numerical inputs of the synthetic patients
+numerical_ranges = {
+    'Age': (20, 90), 'age': (1, 90), 'RestingBP': (80, 200), 'Cholesterol': (0, 600), 'FastingBS': (0, 1),
+    'MaxHR': (60, 202), 'Oldpeak': (-2.0, 6.0), 'avg_glucose_level': (55.0, 270.0), 'bmi': (10.0, 60.0),
+    'HbA1c_level': (3.5, 9.0), 'blood_glucose_level': (80, 300)
+}
+
+
+def synthetic_row(columns, rnd):
+    row = {}
+    for column, spec in columns.items():
+        if isinstance(spec, list):
+            row[column] = rnd.choice(spec)
+        else:
+            low, high = numerical_ranges.get(column, (0, 100))
+            row[column] = rnd.uniform(low, high) if isinstance(low, float) else rnd.randint(low, high)
+    return row
+
+
+# a stored patient document that yields the synthetic rows of every model
+def synthetic_patient(patient_id, rnd):
+    data = {}
+    for spec in model_specs.values():
+        data.update(synthetic_row(spec['columns'], rnd))
+    data['gender'] = rnd.choice(['Male', 'Female'])
+    return {'patient_id': patient_id, 'patient_info': {'age': data.pop('age'), 'gender': data.pop('gender')}, 'manual_data': data}
+
+
+def resident_memory_bytes():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is the peak, in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentiles(samples):
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples_ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 4),
+        'mean_ms': round(float(statistics.fmean(samples_ms)), 4)
+    }
+
+
+def bench_model(model_name, iterations, batch_sizes, rnd):
+    registry = ModelRegistry(check_interval=3600)
+    registry.register(model_name, model_path(model_name), model_loader(model_name))
+
+    memory_before = resident_memory_bytes()
+    start = time.perf_counter()
+    entry = registry.get(model_name)
+    cold_load = time.perf_counter() - start
+    memory_after = resident_memory_bytes()
+
+    model = entry.model
+    columns = model_specs[model_name]['columns']
+    rows = [synthetic_row(columns, rnd) for _ in range(max(batch_sizes + [iterations]))]
+
+    for row in rows[:20]:
+        model.predict_proba_rows([row])
+    single = []
+    for row in rows[:iterations]:
+        start = time.perf_counter()
+        model.predict_proba_rows([row])
+        single.append(time.perf_counter() - start)
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        batch = rows[:batch_size]
+        repeats = max(3, min(50, 2000 // batch_size))
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model.predict_proba_rows(batch)
+        elapsed = time.perf_counter() - start
+        throughput[str(batch_size)] = {
+            'rows_per_second': round(batch_size * repeats / elapsed, 1),
+            'ms_per_batch': round(elapsed / repeats * 1000, 4)
+        }
+
+    return {
+        'artifact': entry.path,
+        'version': entry.version,
+        'cold_load_seconds': round(cold_load, 4),
+        'model_size_bytes': entry.size_bytes,
+        'rss_delta_bytes': memory_after - memory_before,
+        'single_row': percentiles(single),
+        'batch_throughput': throughput
+    }
+
+
+# end-to-end predict_all (fetch, features, inference, write) against a Mongo stand-in
+def bench_predict_all(collection, iterations, rnd):
+    original = diagnose_controller.patient_collection
+    diagnose_controller.patient_collection = collection
+    try:
+        patient_ids = [f'BENCH{i:05d}' for i in range(iterations)]
+        collection.delete_many({'patient_id': {'$in': patient_ids}})
+        collection.insert_many([synthetic_patient(patient_id, rnd) for patient_id in patient_ids])
+        prediction_cache.clear()
+        predict_all(patient_ids[0])
+
+        samples = []
+        for patient_id in patient_ids:
+            start = time.perf_counter()
+            predict_all(patient_id)
+            samples.append(time.perf_counter() - start)
+        collection.delete_many({'patient_id': {'$in': patient_ids}})
+        return percentiles(samples)
+    finally:
+        diagnose_controller.patient_collection = original
+
+
+def stand_in_collection(mongo_uri):
+    if mongo_uri:
+        from pymongo import MongoClient
+        return MongoClient(mongo_uri, serverSelectionTimeoutMS=2000)['bench-db']['patients'], 'mongodb'
+    try:
+        import mongomock
+    except ImportError:
+        return None, None
+    return mongomock.MongoClient()['bench-db']['patients'], 'mongomock'
+
+
+def run(output=None, iterations=500, batch_sizes=(1, 10, 100, 1000), mongo_uri=None, seed=0):
+    rnd = random.Random(seed)
+    import sklearn
+
+    report = {
+        'benchmark': 'diagnose',
+        'created_at': datetime.datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count()
+        },
+        'parameters': {'iterations': iterations, 'batch_sizes': list(batch_sizes), 'seed': seed},
+        'rss_start_bytes': resident_memory_bytes(),
+        'models': {}
+    }
+
+    for model_name in model_specs:
+        if not os.path.exists(model_path(model_name)):
+            report['models'][model_name] = {'skipped': 'artifact not found'}
+            continue
+        report['models'][model_name] = bench_model(model_name, iterations, list(batch_sizes), rnd)
+
+    collection, backend = stand_in_collection(mongo_uri)
+    if all('skipped' in result for result in report['models'].values()):
+        # without a model every prediction is the "Model not available" error, not a latency
+        report['predict_all'] = {'skipped': f'no model artifact found in {diagnose_controller.MODEL_DIR}'}
+    elif collection is not None:
+        report['predict_all'] = {'mongo': backend, **bench_predict_all(collection, min(iterations, 200), rnd)}
+    else:
+        report['predict_all'] = {'skipped': 'no Mongo stand-in; install mongomock or pass --mongo-uri'}
+
+    report['rss_end_bytes'] = resident_memory_bytes()
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
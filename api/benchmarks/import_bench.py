@@ -0,0 +1,70 @@
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+# Cold start of the serverless entry point, measured with `python -X importtime -c "import index"`
+# in a fresh interpreter per run. IMPORT_BUDGET_MS is the budget for the median cumulative import
+# time of index; the modules in LAZY_MODULES must not be imported at all until a route needs them.
+IMPORT_BUDGET_MS = float(os.getenv('IMPORT_BUDGET_MS', 800))
+LAZY_MODULES = ['pandas', 'sklearn', 'joblib', 'fitz', 'pymupdf', 'google.generativeai', 'slack_sdk']
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# [(module, depth, self_us, cumulative_us)] from the stderr of -X importtime
+def parse_importtime(output):
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        imports.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return imports
+
+def import_once(module):
+    env = {**os.environ, 'ENSURE_INDEXES_ON_STARTUP': '0'}
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=API_DIR, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return parse_importtime(completed.stderr)
+
+
+def run(output=None, module='index', runs=5, budget_ms=None, top=15):
+    budget_ms = IMPORT_BUDGET_MS if budget_ms is None else budget_ms
+    # the first run also warms the bytecode cache, so it is not counted
+    import_once(module)
+    samples = [import_once(module) for _ in range(runs)]
+
+    totals = [next(cumulative for name, depth, _, cumulative in imports if name == module and depth == 0) / 1000 for imports in samples]
+    median_run = samples[totals.index(sorted(totals)[len(totals) // 2])]
+    loaded = {name for name, _, _, _ in median_run}
+    top_level = sorted(
+        ((name, round(cumulative / 1000, 1)) for name, depth, _, cumulative in median_run if depth == 1 and name != module),
+        key=lambda item: -item[1]
+    )
+
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    total_ms = round(statistics.median(totals), 1)
+    report = {
+        'benchmark': 'import',
+        'created_at': datetime.datetime.now().isoformat(),
+        'environment': {'python': platform.python_version(), 'machine': platform.machine()},
+        'parameters': {'module': module, 'runs': runs, 'budget_ms': budget_ms},
+        'total_ms': {'median': total_ms, 'min': round(min(totals), 1), 'max': round(max(totals), 1)},
+        'slowest_imports_ms': dict(top_level[:top]),
+        'eager_heavy_modules': eager,
+        'ok': total_ms <= budget_ms and not eager
+    }
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
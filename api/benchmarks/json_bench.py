@@ -0,0 +1,115 @@
+import datetime
+import json
+import platform
+import random
+import time
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from benchmarks.diagnose_bench import percentiles
+from utils import json_provider
+from utils.json_provider import MongoJSONProvider
+
+
+# the conversion pass responses used to go through before jsonify
+def convert_objectid_to_str(data):
+    if isinstance(data, list):
+        return [convert_objectid_to_str(item) for item in data]
+    elif isinstance(data, dict):
+        return {key: convert_objectid_to_str(value) for key, value in data.items()}
+    elif isinstance(data, ObjectId):
+        return str(data)
+    else:
+        return data
+
+
+# A patient document the size of a long admission: many merged lab reports, their anomalies,
+# manual input, predictions and timestamps, as the driver returns it. No Decimal128 values, which
+# the old conversion pass could not serialize at all.
+def large_patient(rnd, reports=200, tests_per_report=30):
+    start = datetime.datetime(2024, 1, 1)
+    lab_results = {f'Test {i}': round(rnd.uniform(0, 500), 2) for i in range(tests_per_report * 4)}
+    anomalies = [
+        {
+            '_id': ObjectId(),
+            'test_name': f'Test {rnd.randrange(tests_per_report * 4)}',
+            'result': round(rnd.uniform(0, 500), 2),
+            'reference_range': '13.00 - 17.00',
+            'unit': 'g/dL',
+            'reported_at': start + datetime.timedelta(hours=i)
+        }
+        for i in range(reports * 3)
+    ]
+    notes = [
+        {'_id': ObjectId(), 'author': f'S{rnd.randrange(50)}', 'text': 'Observation ' * 10, 'created_at': start + datetime.timedelta(hours=i)}
+        for i in range(reports)
+    ]
+    return {
+        '_id': ObjectId(),
+        'patient_id': 'BENCH00001',
+        'patient_info': {'name': 'Bench Patient', 'age': 63, 'gender': 'Female', 'lab': 'Bench Lab', 'lab_address': 'Street ' * 5},
+        'vitals': {'bmi': 27.4, 'ChestPainType': 'ASY'},
+        'lab_results': lab_results,
+        'anomalies': anomalies,
+        'manual_data': {'RestingBP': 150, 'Cholesterol': 260, 'MaxHR': 120, 'Oldpeak': 1.5, 'notes': notes},
+        'staffs_assigned': [f'S{i}' for i in range(5)],
+        'heart_failure_prediction': 0.73,
+        'criticality_score': 42.1,
+        'criticality_updated_at': start,
+        'isEmergency': False
+    }
+
+
+def time_samples(encode, iterations):
+    for _ in range(5):
+        encode()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        encode()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(output=None, iterations=200, reports=200, seed=0):
+    rnd = random.Random(seed)
+    document = large_patient(rnd, reports)
+
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    provider = MongoJSONProvider(app)
+
+    cases = {
+        # before: a converted copy serialized by Flask's default provider
+        'convert_then_default': lambda: default.dumps(convert_objectid_to_str(document)),
+        # any keyword argument selects the standard library encoder
+        'provider_json': lambda: provider.dumps(document, sort_keys=True)
+    }
+    if json_provider.orjson is not None:
+        cases['provider_orjson'] = lambda: provider.dumps_bytes(document)
+
+    results = {}
+    for name, encode in cases.items():
+        results[name] = percentiles(time_samples(encode, iterations))
+    baseline = results['convert_then_default']['mean_ms']
+    for result in results.values():
+        result['speedup'] = round(baseline / result['mean_ms'], 2)
+
+    report = {
+        'benchmark': 'json',
+        'created_at': datetime.datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'orjson': getattr(json_provider.orjson, '__version__', None)
+        },
+        'parameters': {'iterations': iterations, 'reports': reports, 'seed': seed},
+        'document_bytes': len(provider.dumps(document).encode('utf-8')),
+        'results': results
+    }
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
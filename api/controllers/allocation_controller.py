@@ -1,13 +1,12 @@
-from pymongo import MongoClient
 from flask import jsonify
 from dotenv import load_dotenv
 import os
+from utils.db import db
+
 
 load_dotenv()
 
-# MongoDB connection
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client['dev-db']
+# MongoDB collections, on the shared client
 patient_collection = db['patients']
 resource_collection = db['resources']
 user_collection = db['users']
@@ -1,22 +1,20 @@
+import datetime
 import json
-import google.generativeai as genai
 from flask import jsonify, request
-from pymongo import MongoClient, UpdateOne
+from pymongo import UpdateOne
 from dotenv import load_dotenv
 import os
 import re
+from services.gemini_client import generative_model
+from utils.db import db
+
 
 load_dotenv()
 
-# MongoDB connection
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client['dev-db']
+# MongoDB collections, on the shared client
 patient_collection = db['patients']
 careplan_collection = db['careplans']
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
 def split_and_load_ejson(text):
     # Regular expression to find triple backticks with 'json' inside
     pattern = r"```json(.*?)```"
@@ -71,7 +69,7 @@ def generate_care_plan(patient_id):
         """
 
         # Interact with Gemini API
-        model = genai.GenerativeModel(model_name="models/gemini-1.5-flash")
+        model = generative_model("models/gemini-1.5-flash")
         response = model.generate_content([prompt])
 
         # Parse JSON from the response text using regex-based function
@@ -113,7 +111,7 @@ def get_meal_plan(data):
             """
         
         # Interact with Gemini API
-        model = genai.GenerativeModel(model_name="models/gemini-1.5-flash")
+        model = generative_model("models/gemini-1.5-flash")
         response = model.generate_content([prompt])
 
         # Parse JSON from the response text using regex-based function
@@ -237,7 +235,7 @@ def det_criticality_score(patient_id):
     """
     
     # Interact with Gemini API
-    model = genai.GenerativeModel(model_name="models/gemini-1.5-flash")
+    model = generative_model("models/gemini-1.5-flash")
     response = model.generate_content([prompt])
 
     # Parse JSON from the response text using regex-based function
@@ -253,14 +251,15 @@ def det_criticality_score(patient_id):
     if not result:
         return {'error': 'Failed to parse JSON response'}
     
-    # update the patient's criticality score
-    patient_collection.update_one(
-        {'patient_id': patient_id},
-        {'$set': {'criticality_score': result['criticality_score']}}
-    )
+    # Kept apart from criticality_score, which is computed and stored on every write to the score
+    # inputs and is what the triage leaderboard sorts on
     patient_collection.update_one(
         {'patient_id': patient_id},
-        {'$set': {'criticality_level': result['criticality_level']}}
+        {'$set': {
+            'llm_criticality_score': result.get('criticality_score'),
+            'llm_criticality_level': result.get('criticality_level'),
+            'llm_criticality_updated_at': datetime.datetime.utcnow()
+        }}
     )
     return result
 
@@ -284,7 +283,7 @@ def ask_patient_specific(patient_id, query):
     """
 
     # Interact with Gemini API
-    model = genai.GenerativeModel(model_name="models/gemini-1.5-flash")
+    model = generative_model("models/gemini-1.5-flash")
     response = model.generate_content([prompt])
 
     # Parse JSON from the response text using regex-based function
@@ -316,7 +315,7 @@ def ask_general(query):
     """
 
     # Interact with Gemini API
-    model = genai.GenerativeModel(model_name="models/gemini-1.5-flash")
+    model = generative_model("models/gemini-1.5-flash")
     response = model.generate_content([prompt])
 
     # Parse JSON from the response text using regex-based function
@@ -1,17 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
 from flask import Flask, jsonify
-from pymongo import MongoClient
-import joblib
-import pandas as pd
+from pymongo import UpdateOne
 from dotenv import load_dotenv
 import os
 import numpy as np
+import time
+
+from services.model_registry import registry
+from services.feature_encoder import EncodedModel
+from services.forest_engine import export_pipeline, load_compact_model
+from services.model_registry import file_sha256, joblib_load
+from services.prediction_cache import prediction_cache, feature_fingerprint
+from services.feature_schema import FeatureValidator
+from services.model_server import ModelServer
+from utils.db import db
 
 
 load_dotenv()
 
-# MongoDB connection
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client['dev-db']
+# MongoDB collections, on the shared client
 patient_collection = db['patients']
 
 # model columns
@@ -20,11 +28,111 @@ heart_model_columns = {'Age': 'numerical', 'Sex': ['M', 'F'], 'ChestPainType': [
 stroke_model_columns = {'gender': ['Male', 'Female', 'Other'], 'age': 'numerical', 'hypertension': [0, 1], 'heart_disease': [1, 0], 'ever_married': ['Yes', 'No'], 'work_type': ['Private', 'Self-employed', 'Govt_job', 'children', 'Never_worked'], 'Residence_type': ['Urban', 'Rural'], 'avg_glucose_level': 'numerical', 'bmi': 'numerical', 'smoking_status': ['formerly smoked', 'never smoked', 'smokes', 'Unknown']}
 diabetes_model_columns = {'gender': ['Female', 'Male', 'Other'], 'age': 'numerical', 'hypertension': [0, 1], 'heart_disease': [1, 0], 'smoking_history': ['never', 'No Info', 'current', 'former', 'ever', 'not current'], 'bmi': 'numerical', 'HbA1c_level': 'numerical', 'blood_glucose_level': 'numerical'}
 
-# Functions
-def fetch_patient_data(patient_id):
-    patient_data = patient_collection.find_one({'patient_id': patient_id})
-    if not patient_data:
+# feature order each model was trained on and where its predictions are stored
+model_specs = {
+    'heart': {
+        'columns': heart_model_columns,
+        'numerical': ['Age', 'RestingBP', 'Cholesterol', 'FastingBS', 'MaxHR', 'Oldpeak'],
+        'categorical': ['Sex', 'ChestPainType', 'RestingECG', 'ExerciseAngina', 'ST_Slope'],
+        'prediction_field': 'heart_failure_prediction',
+        'confidence_field': 'heart_failure_prediction_confidence'
+    },
+    'stroke': {
+        'columns': stroke_model_columns,
+        'numerical': ['age', 'hypertension', 'heart_disease', 'avg_glucose_level', 'bmi'],
+        'categorical': ['gender', 'ever_married', 'work_type', 'Residence_type', 'smoking_status'],
+        'prediction_field': 'stroke_prediction',
+        'confidence_field': 'stroke_prediction_confidence'
+    },
+    'diabetes': {
+        'columns': diabetes_model_columns,
+        'numerical': ['age', 'hypertension', 'heart_disease', 'bmi', 'HbA1c_level', 'blood_glucose_level'],
+        'categorical': ['gender', 'smoking_history'],
+        'prediction_field': 'diabetes_prediction',
+        'confidence_field': 'diabetes_confidence'
+    }
+}
+
+# gender is normalized before the checks, heart additionally derives Age and Sex
+gender_rule = ('map', 'gender', ['Male', 'male', 'M'], 'Male', 'Female')
+feature_validator = FeatureValidator(
+    {model_name: spec['columns'] for model_name, spec in model_specs.items()},
+    {
+        'heart': {'Age': ('default', 'age', 0), 'Sex': ('map', 'gender', ['M', 'Male', 'male'], 'M', 'F')},
+        'stroke': {'gender': gender_rule},
+        'diabetes': {'gender': gender_rule}
+    }
+)
+
+# only the sub-documents the models read from
+patient_projection = {'_id': 0, 'patient_id': 1, 'lab_results': 1, 'vitals': 1, 'patient_info': 1, 'manual_data': 1}
+
+# load a model artifact: an exported compact forest (.npz) or a pickled pipeline whose
+# preprocessing is compiled into a numpy feature encoder
+def model_loader(model_name):
+    spec = model_specs[model_name]
+    expected_columns = spec['numerical'] + spec['categorical']
+
+    def load(path):
+        if path.endswith('.npz'):
+            return load_compact_model(path)
+        return EncodedModel(joblib_load(path), expected_columns)
+    return load
+
+# model artifacts live in models/ at the repository root, wherever the process is started from
+MODEL_DIR = os.getenv('MODEL_DIR') or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'models')
+
+def model_file(model_name, extension):
+    return os.path.join(MODEL_DIR, f'{model_name}_rf_model.{extension}')
+
+# serve the compact export when one has been generated next to the pickle
+def model_path(model_name):
+    compact_path = model_file(model_name, 'npz')
+    if os.getenv('MODEL_FORMAT', 'compact') == 'compact' and os.path.exists(compact_path):
+        return compact_path
+    return model_file(model_name, 'pkl')
+
+# model artifacts, loaded once per process and reloaded when the file changes
+for model_name in model_specs:
+    registry.register(model_name, model_path(model_name), model_loader(model_name))
+
+# optional process-pool serving, enabled with MODEL_SERVING=pool; otherwise models run in-process
+model_server = None
+model_server_lock = threading.Lock()
+
+def preload_models():
+    for model_name in model_specs:
+        try:
+            registry.get(model_name)
+        except FileNotFoundError:
+            pass
+
+def get_model_server():
+    global model_server
+    if os.getenv('MODEL_SERVING', 'inline') != 'pool':
         return None
+    if model_server is None:
+        with model_server_lock:
+            if model_server is None:
+                # load before forking so the pool workers share the model pages
+                preload_models()
+                model_server = ModelServer(
+                    workers=int(os.getenv('MODEL_POOL_WORKERS', 0)) or None,
+                    window_ms=float(os.getenv('MODEL_BATCH_WINDOW_MS', 2)),
+                    max_batch=int(os.getenv('MODEL_MAX_BATCH', 256)),
+                    modules=(__name__,)
+                ).start()
+    return model_server
+
+# with a preloading server (e.g. gunicorn --preload) every worker inherits the loaded models
+if os.getenv('MODEL_SERVING', 'inline') == 'pool':
+    preload_models()
+
+# evaluates the models of one patient concurrently
+model_executor = ThreadPoolExecutor(max_workers=len(model_specs), thread_name_prefix='diagnose')
+
+# Functions
+def merge_patient_data(patient_data):
     # combine lab results, patint info and vitals
     lab_results = patient_data.get('lab_results', {})
     vitals = patient_data.get('vitals', {})
@@ -33,191 +141,289 @@ def fetch_patient_data(patient_id):
     data = {**lab_results, **vitals, **patient_info, **manual_data}
     return data
 
+def fetch_patient_data(patient_id):
+    patient_data = patient_collection.find_one({'patient_id': patient_id}, patient_projection)
+    if not patient_data:
+        return None
+    return merge_patient_data(patient_data)
+
+# derive the model specific inputs from the merged patient data
+def prepare_model_data(model_name, patient_data):
+    if model_name == 'heart':
+        patient_data = dict(patient_data)
+        patient_data['Age'] = patient_data.get('age', 0)
+        gender = patient_data.get('gender', 'M')
+        if gender in ['Male', 'male', 'M']:
+            patient_data['Sex'] = 'M'
+        else:
+            patient_data['Sex'] = 'F'
+    return patient_data
+
+# convert a predict_proba row into the native python prediction and confidence
+def to_prediction(classes, proba_row):
+    index = int(np.argmax(proba_row))
+    prediction = classes[index]
+    prediction = int(prediction) if isinstance(prediction, np.integer) else prediction
+    return prediction, float(proba_row[index])
+
+# pick the model inputs out of the merged patient data, listing any that are absent
+def build_model_row(model_name, patient_data):
+    columns = model_specs[model_name]['columns']
+    model_data = prepare_model_data(model_name, patient_data)
+    missing = [column for column in columns if column not in model_data]
+    if missing:
+        return None, missing
+    return {key: model_data[key] for key in columns}, []
+
+# (version, classes, probabilities) from the process pool when enabled, in-process otherwise
+def run_inference(model_name, entry, rows):
+    server = get_model_server()
+    if server is not None:
+        try:
+            return server.predict(model_name, rows)
+        except (RuntimeError, OSError) as e:
+            print(f"Model server unavailable, predicting in-process: {e}")
+    return entry.version, entry.model.classes_, entry.model.predict_proba_rows(rows)
+
+# score many rows of one model; cached results are reused and the rest go through a single predict_proba call
+def predict_rows(model_name, rows, patient_ids=None):
+    try:
+        entry = registry.get(model_name)
+    except FileNotFoundError:
+        return [{'error': 'Model not available'} for _ in rows]
+
+    results = [None] * len(rows)
+    misses = []
+    for i, row in enumerate(rows):
+        fingerprint = feature_fingerprint(row)
+        cached = prediction_cache.get(model_name, entry.version, fingerprint)
+        if cached is not None:
+            results[i] = {**cached, 'cached': True}
+        else:
+            misses.append((i, fingerprint))
+
+    if misses:
+        version, classes, prediction_proba = run_inference(model_name, entry, [rows[i] for i, _ in misses])
+        for (i, fingerprint), proba_row in zip(misses, prediction_proba):
+            prediction, confidence = to_prediction(classes, proba_row)
+            result = {'prediction': prediction, 'confidence': confidence}
+            prediction_cache.put(model_name, version, fingerprint, result, patient_ids[i] if patient_ids else None)
+            results[i] = {**result, 'cached': False}
+    return results
+
+# raw patient fields each model reads, including the ones its inputs are derived from
+model_input_fields = {model_name: set(spec['columns']) for model_name, spec in model_specs.items()}
+model_input_fields['heart'] |= {'age', 'gender'}
+
+# drop cached predictions of the models that read any of the changed fields
+def invalidate_predictions(patient_id, changed_fields):
+    changed_fields = set(changed_fields)
+    models = [model_name for model_name, fields in model_input_fields.items() if fields & changed_fields]
+    if models:
+        prediction_cache.invalidate(patient_id, models)
+    return models
+
+# fields a model result is persisted under
+def prediction_update(model_name, result):
+    if 'error' in result:
+        return {}
+    spec = model_specs[model_name]
+    return {spec['prediction_field']: result['prediction'], spec['confidence_field']: result['confidence']}
+
 
 def heart_missing_columns(patient_id):
-    patient_data = fetch_patient_data(patient_id)
-    if not patient_data:
-        return jsonify({'error': 'Patient not found'}), 304
-    patient_data['Age'] = patient_data.get('age', 0)
-    gender = patient_data['gender']
-    if gender == 'Male' or gender == 'male' or gender == 'M':
-        patient_data['Sex'] = 'M'
-    else:
-        patient_data['Sex'] = 'F'
-
-    # check if each column is present in the patient data, if category, check if the value is in the category list, if not, add to missing columns
-    missing_columns = {}
-    for column, value in heart_model_columns.items():
-        if column not in patient_data or patient_data[column] is None:
-            missing_columns[column] = value
-        elif isinstance(value, list) and patient_data[column] not in value:
-            missing_columns[column] = value
-
-    return missing_columns
+    return model_missing_columns('heart', patient_id)
 
 def predict_heart(patient_id):
-    patient_data = fetch_patient_data(patient_id)
-    if not patient_data:
-        return jsonify({'error': 'Patient not found'}), 304
-    
-    patient_data['Age'] = patient_data.get('age', 0)
-    gender = patient_data.get('gender', 'M')
-    if gender in ['Male', 'male', 'M']:
-        patient_data['Sex'] = 'M'
-    else:
-        patient_data['Sex'] = 'F'
-    
-    # get only the columns needed for the model
-    heart_data = {key: patient_data[key] for key in heart_model_columns.keys()}
-    
-    # load the model
-    heart_model = joblib.load('models/heart_rf_model.pkl')
-
-    numerical_features = ['Age', 'RestingBP', 'Cholesterol', 'FastingBS', 'MaxHR', 'Oldpeak']
-    categorical_features = ['Sex', 'ChestPainType', 'RestingECG', 'ExerciseAngina', 'ST_Slope']
-
-    expected_columns = numerical_features + categorical_features
-
-    new_data = pd.DataFrame([heart_data])
-    new_data = new_data.reindex(columns=expected_columns, fill_value=0)
-
-    prediction = heart_model.predict(new_data)
-    prediction_proba = heart_model.predict_proba(new_data)
-
-    # Convert numpy types to native Python types
-    heart_prediction = int(prediction[0]) if isinstance(prediction[0], np.integer) else prediction[0]
-    heart_confidence = float(max(prediction_proba[0])) if isinstance(max(prediction_proba[0]), np.floating) else max(prediction_proba[0])
-
-    # update patient data with prediction
-    patient_collection.update_one(
-        {'patient_id': patient_id},
-        {'$set': {'heart_failure_prediction': heart_prediction, 'heart_failure_prediction_confidence': heart_confidence}}
-    )
-
-    return {'prediction': heart_prediction, 'confidence': heart_confidence}
+    return predict_model('heart', patient_id)
 
 def stroke_missing_columns(patient_id):
-    patient_data = fetch_patient_data(patient_id)
-    if not patient_data:
-        return jsonify({'error': 'Patient not found'}), 304
-    
-    gender = patient_data.get('gender', 'Male')
-    if gender in ['Male', 'male', 'M']:
-        patient_data['gender'] = 'Male'
-    else:
-        patient_data['gender'] = 'Female'
-
-    missing_columns = {}
-    for column, value in stroke_model_columns.items():
-        if column not in patient_data or patient_data[column] is None:
-            missing_columns[column] = value
-        elif isinstance(value, list) and patient_data[column] not in value:
-            missing_columns[column] = value
-
-    return missing_columns
+    return model_missing_columns('stroke', patient_id)
 
 def predict_stroke(patient_id):
-    patient_data = fetch_patient_data(patient_id)
-    if not patient_data:
-        return jsonify({'error': 'Patient not found'}), 304
-
-    # get only the columns needed for the model
-    stroke_data = {key: patient_data[key] for key in stroke_model_columns.keys()}
-    
-    # load the model
-    stroke_model = joblib.load('models/stroke_rf_model.pkl')
+    return predict_model('stroke', patient_id)
 
-    categorical_features=['gender', 'ever_married', 'work_type', 'Residence_type', 'smoking_status']
-    numerical_features=['age', 'hypertension', 'heart_disease', 'avg_glucose_level', 'bmi']
-
-    expected_columns = numerical_features + categorical_features
-
-    new_data = pd.DataFrame([stroke_data])
-
-    new_data = new_data.reindex(columns=expected_columns, fill_value=0)
-
-    prediction = stroke_model.predict(new_data)
-    prediction_proba = stroke_model.predict_proba(new_data)
-
-    # Convert numpy types to native Python types
-    stroke_prediction = int(prediction[0]) if isinstance(prediction[0], np.integer) else prediction[0]
-    stroke_confidence = float(max(prediction_proba[0])) if isinstance(max(prediction_proba[0]), np.floating) else max(prediction_proba[0])
+def diabetes_missing_columns(patient_id):
+    return model_missing_columns('diabetes', patient_id)
 
-    # update patient data with prediction
-    patient_collection.update_one(
-        {'patient_id': patient_id},
-        {'$set': {'stroke_prediction': stroke_prediction, 'stroke_prediction_confidence': stroke_confidence}}
-    )
+def predict_diabetes(patient_id):
+    return predict_model('diabetes', patient_id)
 
-    return {'prediction': stroke_prediction, 'confidence': stroke_confidence}
 
-def diabetes_missing_columns(patient_id):
+# check if each column is present in the patient data, if category, check if the value is in the category list
+def model_missing_columns(model_name, patient_id):
     patient_data = fetch_patient_data(patient_id)
     if not patient_data:
         return jsonify({'error': 'Patient not found'}), 304
-    
-    gender = patient_data.get('gender', 'Male')
-    if gender in ['Male', 'male', 'M']:
-        patient_data['gender'] = 'Male'
-    else:
-        patient_data['gender'] = 'Female'
-
-    missing_columns = {}
-    for column, value in diabetes_model_columns.items():
-        if column not in patient_data or patient_data[column] is None:
-            missing_columns[column] = value
-        elif isinstance(value, list) and patient_data[column] not in value:
-            missing_columns[column] = value
-
-    return missing_columns
+    return feature_validator.missing(patient_data)[model_name]
 
-def predict_diabetes(patient_id):
+# missing inputs of all three models from a single fetch
+def get_all_missing_columns(patient_id):
     patient_data = fetch_patient_data(patient_id)
     if not patient_data:
-        return jsonify({'error': 'Patient not found'}), 304
-
-    # get only the columns needed for the model
-    diabetes_data = {key: patient_data[key] for key in diabetes_model_columns.keys()}
-    
-    # load the model
-    diabetes_model = joblib.load('models/diabetes_rf_model.pkl')
-
-    categorical_features=['gender', 'smoking_history']
-    numerical_features=['age', 'hypertension', 'heart_disease', 'bmi', 'HbA1c_level', 'blood_glucose_level']
-
-    expected_columns = numerical_features + categorical_features
-
-    new_data = pd.DataFrame([diabetes_data])
-
-    new_data = new_data.reindex(columns=expected_columns, fill_value=0)
-
-    prediction = diabetes_model.predict(new_data)
-    prediction_proba = diabetes_model.predict_proba(new_data)
-
-    # Convert numpy types to native Python types
-    diabetes_prediction = int(prediction[0]) if isinstance(prediction[0], np.integer) else prediction[0]
-    diabetes_confidence = float(max(prediction_proba[0])) if isinstance(max(prediction_proba[0]), np.floating) else max(prediction_proba[0])
-
-    # update patient data with prediction
-    patient_collection.update_one(
-        {'patient_id': patient_id},
-        {'$set': {'diabetes_prediction': diabetes_prediction, 'diabetes_confidence': diabetes_confidence}}
-    )
-
-    return {'prediction': diabetes_prediction, 'confidence': diabetes_confidence}
+        return {'error': 'Patient not found'}
+    return feature_validator.missing_columns(patient_data)
+
+# missing model inputs for every patient of a cohort, computed inside MongoDB
+def get_cohort_missing_columns(data):
+    query = cohort_query(data)
+    if query is None:
+        return {'error': 'Provide patient_ids, staff_id or ward'}
+
+    pipeline = [
+        {'$match': query},
+        {'$project': {'_id': 0, 'patient_id': 1, 'data': {'$mergeObjects': ['$lab_results', '$vitals', '$patient_info', '$manual_data']}}},
+        feature_validator.missing_stage(),
+        {'$sort': {'patient_id': 1}}
+    ]
+    patients = list(patient_collection.aggregate(pipeline))
+
+    # how many patients miss each column, so vitals can be collected in one round
+    summary = {}
+    for patient in patients:
+        for column in {column for columns in patient['missing'].values() for column in columns}:
+            summary[column] = summary.get(column, 0) + 1
+
+    return {'patients': patients, 'summary': dict(sorted(summary.items(), key=lambda item: -item[1]))}
+
+# predict a single disease for a patient and store the result
+def predict_model(model_name, patient_id):
+    patient_data = fetch_patient_data(patient_id)
+    if not patient_data:
+        return {'error': 'Patient not found'}
 
+    row, missing = build_model_row(model_name, patient_data)
+    if missing:
+        return {'error': 'Missing columns', 'missing_columns': missing}
 
-def get_all_missing_columns(patient_id):
-    heart_columns = heart_missing_columns(patient_id)
-    stroke_columns = stroke_missing_columns(patient_id)
-    diabetes_columns = diabetes_missing_columns(patient_id)
-    missing_columns = {**heart_columns, **stroke_columns, **diabetes_columns}
-    return missing_columns
+    result = predict_rows(model_name, [row], [patient_id])[0]
+    update = prediction_update(model_name, result)
+    if update:
+        patient_collection.update_one({'patient_id': patient_id}, {'$set': update})
+    return result
 
-# predict all diseases sequentially
+# predict all diseases from one fetch: shared features, concurrent models, one write
 def predict_all(patient_id):
-    heart_prediction = predict_heart(patient_id)
-    stroke_prediction = predict_stroke(patient_id)
-    diabetes_prediction = predict_diabetes(patient_id)
-    return {'heart': heart_prediction, 'stroke': stroke_prediction, 'diabetes': diabetes_prediction}
+    timings = {}
+    start = stage = time.perf_counter()
+
+    def lap(name):
+        nonlocal stage
+        now = time.perf_counter()
+        timings[name] = round((now - stage) * 1000, 3)
+        stage = now
+
+    patient = patient_collection.find_one({'patient_id': patient_id}, patient_projection)
+    lap('fetch_ms')
+    if not patient:
+        return {'error': 'Patient not found'}
+
+    patient_data = merge_patient_data(patient)
+    results = {}
+    rows = {}
+    for model_name in model_specs:
+        row, missing = build_model_row(model_name, patient_data)
+        if missing:
+            results[model_name] = {'error': 'Missing columns', 'missing_columns': missing}
+        else:
+            rows[model_name] = row
+    lap('features_ms')
+
+    futures = {model_name: model_executor.submit(predict_rows, model_name, [row], [patient_id]) for model_name, row in rows.items()}
+    for model_name, future in futures.items():
+        results[model_name] = future.result()[0]
+    lap('inference_ms')
+
+    update = {}
+    for model_name, result in results.items():
+        update.update(prediction_update(model_name, result))
+    if update:
+        patient_collection.update_one({'patient_id': patient_id}, {'$set': update})
+    lap('write_ms')
+
+    timings['total_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return {'heart': results['heart'], 'stroke': results['stroke'], 'diabetes': results['diabetes'], 'timings': timings}
+
+# build the patient query for a cohort: explicit patient ids, a staff member or a ward
+def cohort_query(data):
+    if data.get('patient_ids'):
+        return {'patient_id': {'$in': list(data['patient_ids'])}}
+    if data.get('staff_id'):
+        return {'staffs_assigned': data['staff_id']}
+    if data.get('ward'):
+        return {'ward': data['ward']}
+    return None
+
+# score a whole cohort: one query, one predict_proba per model and one bulk write
+def predict_batch(data):
+    query = cohort_query(data or {})
+    if query is None:
+        return {'error': 'Provide patient_ids, staff_id or ward'}
+
+    patients = {}
+    for patient in patient_collection.find(query, patient_projection):
+        patients[patient['patient_id']] = merge_patient_data(patient)
+
+    results = {patient_id: {} for patient_id in patients}
+    updates = {patient_id: {} for patient_id in patients}
+
+    for model_name in model_specs:
+        patient_ids = []
+        rows = []
+        for patient_id, patient_data in patients.items():
+            row, missing = build_model_row(model_name, patient_data)
+            if missing:
+                results[patient_id][model_name] = {'error': 'Missing columns', 'missing_columns': missing}
+                continue
+            patient_ids.append(patient_id)
+            rows.append(row)
+
+        if not rows:
+            continue
+
+        for patient_id, result in zip(patient_ids, predict_rows(model_name, rows, patient_ids)):
+            results[patient_id][model_name] = result
+            updates[patient_id].update(prediction_update(model_name, result))
+
+    operations = [UpdateOne({'patient_id': patient_id}, {'$set': fields}) for patient_id, fields in updates.items() if fields]
+    if operations:
+        patient_collection.bulk_write(operations, ordered=False)
+
+    response = {'scored': len(operations), 'results': results}
+    if data.get('patient_ids'):
+        response['not_found'] = [patient_id for patient_id in data['patient_ids'] if patient_id not in patients]
+    return response
+
+# loaded model versions, load times and memory sizes
+def get_model_info():
+    return registry.info()
+
+# flatten the pickled pipelines into compact .npz artifacts next to them
+def export_models(names=None):
+    exported = {}
+    for model_name in names or model_specs:
+        source = model_file(model_name, 'pkl')
+        if not os.path.exists(source):
+            exported[model_name] = {'error': 'Model not available'}
+            continue
+        target = model_file(model_name, 'npz')
+        compact = export_pipeline(joblib_load(source), target, source_sha256=file_sha256(source))
+        exported[model_name] = {'path': target, 'nbytes': compact.nbytes, 'n_trees': compact.forest.n_trees}
+        registry.register(model_name, model_path(model_name), model_loader(model_name))
+    return exported
+
+# hit/miss counters of the prediction cache
+def get_prediction_cache_stats():
+    return prediction_cache.stats()
+
+# request and batch counters of the process-pool server
+def get_model_server_stats():
+    server = get_model_server()
+    if server is None:
+        return {'mode': 'inline'}
+    return {'mode': 'pool', **server.stats()}
+
+# force a reload of one or all models from disk
+def reload_models(name=None):
+    return registry.reload(name)
 
@@ -1,15 +1,14 @@
 import datetime
 from flask import jsonify, request
-from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 from bson import ObjectId
+from utils.db import db
+
 
 load_dotenv()
 
-# MongoDB connection
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client['dev-db']
+# MongoDB collections, on the shared client
 forum_collection = db['forum']
 
 # create a new post
@@ -33,7 +32,7 @@ def get_posts(selected_posts):
     for post in forum_collection.aggregate([{'$sample': {'size': 15}}]):
         if str(post['_id']) not in selected_posts:
             posts.append({
-                'id': str(post['_id']),
+                'id': post['_id'],
                 'title': post['title'],
                 'content': post['content'],
                 'author': post['author'],
@@ -55,7 +54,7 @@ def comment_on_post(post_id, comment):
 def get_post(post_id):
     post = forum_collection.find_one({'_id': ObjectId(post_id)})
     return {
-        'id': str(post['_id']),
+        'id': post['_id'],
         'title': post['title'],
         'content': post['content'],
         'author': post['author'],
@@ -90,7 +89,7 @@ def search_post(title):
     posts = []
     for post in forum_collection.find({'title': {'$regex': title, '$options': 'i'}}):
         posts.append({
-            'id': str(post['_id']),
+            'id': post['_id'],
             'title': post['title'],
             'content': post['content'],
             'author': post['author'],
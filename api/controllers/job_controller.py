@@ -0,0 +1,287 @@
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import socket
+import threading
+import time
+import uuid
+from bson import Binary
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+import os
+from utils.db import db
+
+
+load_dotenv()
+
+# MongoDB collections, on the shared client
+job_collection = db['jobs']
+job_payload_collection = db['job_payloads']
+
+# Where jobs run. 'thread': on a bounded pool in the process that accepted them. 'worker': only
+# queued in the database and run by `manage.py run-jobs`, a long-running process. A serverless
+# function is frozen once its response is sent, so on Vercel jobs default to a worker.
+JOB_EXECUTION = os.getenv('JOB_EXECUTION') or ('worker' if os.getenv('VERCEL') else 'thread')
+
+# At most JOB_QUEUE_LIMIT jobs are accepted (queued or running) per process in thread mode.
+# Payloads wait in the job_payloads collection, not in memory, and are read when the job starts.
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+job_slots = threading.BoundedSemaphore(int(os.getenv('JOB_QUEUE_LIMIT', 64)))
+MAX_JOB_WAIT_SECONDS = 30
+
+# An accepted job is leased by the process running it, which renews the lease every
+# JOB_LEASE_SECONDS / 4 while the job is queued or running there. A job whose lease expired lost
+# its process (killed, or frozen after the response); it is failed, and submitting the same work
+# again starts a new job. Jobs waiting for a worker are leased for JOB_QUEUE_TIMEOUT_SECONDS.
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', 120))
+JOB_QUEUE_TIMEOUT_SECONDS = float(os.getenv('JOB_QUEUE_TIMEOUT_SECONDS', 3600))
+JOB_PAYLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+
+# identifies this process as the owner of the jobs it runs
+process_token = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+job_handlers = {}
+job_events = {}
+job_events_lock = threading.Lock()
+heartbeat_thread = None
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+# Register the function running jobs of a type: handler(params, files) with the params and the
+# (name, bytes) files the job was submitted with. Handlers are looked up by type, so a worker
+# process can run jobs submitted anywhere.
+def job_handler(job_type):
+    def register(handler):
+        job_handlers[job_type] = handler
+        return handler
+    return register
+
+def utcnow():
+    return datetime.datetime.utcnow()
+
+def lease(seconds=JOB_LEASE_SECONDS):
+    return utcnow() + datetime.timedelta(seconds=seconds)
+
+def job_to_dict(job):
+    job['job_id'] = job.pop('_id')
+    for field in ('active', 'owner', 'params', 'files', 'lease_expires_at'):
+        job.pop(field, None)
+    return job
+
+
+# Files of a job, stored in chunks below the document size limit. Returns [{'name', 'size'}].
+def store_job_payload(job_id, files):
+    entries = []
+    for i, (name, data) in enumerate(files):
+        chunks = [data[start:start + JOB_PAYLOAD_CHUNK_BYTES] for start in range(0, len(data), JOB_PAYLOAD_CHUNK_BYTES)] or [b'']
+        for seq, chunk in enumerate(chunks):
+            job_payload_collection.insert_one({'job_id': job_id, 'file': i, 'seq': seq, 'data': Binary(chunk)})
+        entries.append({'name': name, 'size': len(data)})
+    return entries
+
+def load_job_payload(job):
+    chunks = {}
+    for chunk in job_payload_collection.find({'job_id': job['_id']}).sort([('file', 1), ('seq', 1)]):
+        chunks.setdefault(chunk['file'], []).append(bytes(chunk['data']))
+    return [(entry['name'], b''.join(chunks.get(i, []))) for i, entry in enumerate(job.get('files') or [])]
+
+def delete_job_payload(job_ids):
+    job_payload_collection.delete_many({'job_id': {'$in': list(job_ids)}})
+
+
+# Fail active jobs matching query whose lease has expired, dropping their payloads
+def expire_stale_jobs(query=None):
+    stale = {**(query or {}), 'active': True, 'lease_expires_at': {'$lt': utcnow()}}
+    job_ids = [job['_id'] for job in job_collection.find(stale, {'_id': 1})]
+    if not job_ids:
+        return 0
+    job_collection.update_many(
+        {**stale, '_id': {'$in': job_ids}},
+        {'$set': {
+            'active': False,
+            'status': 'failed',
+            'error': 'Job lease expired: the process running it stopped before it finished',
+            'finished_at': utcnow()
+        }}
+    )
+    delete_job_payload(job_ids)
+    return len(job_ids)
+
+# Renew the leases of every job this process holds, until it holds none
+def renew_leases():
+    global heartbeat_thread
+    while True:
+        time.sleep(JOB_LEASE_SECONDS / 4)
+        with job_events_lock:
+            job_ids = list(job_events)
+            if not job_ids:
+                heartbeat_thread = None
+                return
+        try:
+            now = utcnow()
+            job_collection.update_many(
+                {'_id': {'$in': job_ids}, 'owner': process_token, 'active': True},
+                {'$set': {'heartbeat_at': now, 'lease_expires_at': now + datetime.timedelta(seconds=JOB_LEASE_SECONDS)}}
+            )
+        except Exception as e:
+            print(f'Could not renew job leases: {e}')
+
+# start tracking a job owned by this process; its lease is renewed until it finishes
+def hold_job(job_id):
+    global heartbeat_thread
+    with job_events_lock:
+        job_events[job_id] = threading.Event()
+        if heartbeat_thread is None:
+            heartbeat_thread = threading.Thread(target=renew_leases, name='job-heartbeat', daemon=True)
+            heartbeat_thread.start()
+
+def finish_job(job_id, update):
+    update['active'] = False
+    update['finished_at'] = utcnow()
+    # a job whose lease expired meanwhile was already failed; its late outcome is dropped
+    job_collection.update_one({'_id': job_id, 'owner': process_token, 'active': True}, {'$set': update})
+    delete_job_payload([job_id])
+
+def run_job(job_id):
+    started = time.perf_counter()
+    try:
+        now = utcnow()
+        job = job_collection.find_one_and_update(
+            {'_id': job_id, 'owner': process_token, 'active': True},
+            {'$set': {'status': 'running', 'started_at': now, 'heartbeat_at': now, 'lease_expires_at': lease()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            return
+        try:
+            result = job_handlers[job['type']](job.get('params') or {}, load_job_payload(job))
+        except Exception as e:
+            finish_job(job_id, {'status': 'failed', 'error': str(e), 'seconds': round(time.perf_counter() - started, 3)})
+            return
+        if isinstance(result, dict) and 'error' in result:
+            finish_job(job_id, {'status': 'failed', 'error': result['error'], 'seconds': round(time.perf_counter() - started, 3)})
+        else:
+            finish_job(job_id, {'status': 'completed', 'result': result, 'seconds': round(time.perf_counter() - started, 3)})
+    finally:
+        # wakes up get_job calls waiting on this job; the lease is no longer renewed
+        with job_events_lock:
+            event = job_events.pop(job_id, None)
+        if event:
+            event.set()
+
+def run_held_job(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        job_slots.release()
+
+# Queue a job of the given type with its params and (name, bytes) files. Returns (job, created):
+# when an active job with the same dedupe_key exists, that job is returned instead and nothing
+# new is queued.
+def submit_job(job_type, dedupe_key, params=None, files=(), fields=None):
+    query = {'type': job_type, 'dedupe_key': dedupe_key, 'active': True}
+    # a job that lost its process is failed, so this submission starts a new one
+    expire_stale_jobs(query)
+    existing = job_collection.find_one(query)
+    if existing is not None:
+        return job_to_dict(existing), False
+
+    in_process = JOB_EXECUTION == 'thread'
+    if in_process and not job_slots.acquire(blocking=False):
+        raise JobQueueFull('Too many jobs in progress, try again later')
+
+    job_id = uuid.uuid4().hex
+    try:
+        entries = store_job_payload(job_id, files)
+        now = utcnow()
+        job = job_collection.find_one_and_update(
+            query,
+            {'$setOnInsert': {
+                '_id': job_id,
+                'status': 'queued',
+                'created_at': now,
+                'heartbeat_at': now,
+                # in thread mode this process holds the job from the start; otherwise any worker may claim it
+                'owner': process_token if in_process else None,
+                'lease_expires_at': lease() if in_process else lease(JOB_QUEUE_TIMEOUT_SECONDS),
+                'params': params or {},
+                'files': entries,
+                **(fields or {})
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # lost the race against a concurrent identical submission
+        job = job_collection.find_one(query)
+    except Exception:
+        delete_job_payload([job_id])
+        if in_process:
+            job_slots.release()
+        raise
+
+    if job is None or job['_id'] != job_id:
+        delete_job_payload([job_id])
+        if in_process:
+            job_slots.release()
+        if job is None:
+            return submit_job(job_type, dedupe_key, params, files, fields)
+        return job_to_dict(job), False
+
+    if in_process:
+        hold_job(job_id)
+        job_executor.submit(run_held_job, job_id)
+    return job_to_dict(job), True
+
+# claim the oldest job waiting for a worker, or None
+def claim_job():
+    return job_collection.find_one_and_update(
+        {'active': True, 'owner': None, 'status': 'queued', 'lease_expires_at': {'$gte': utcnow()}},
+        {'$set': {'owner': process_token, 'heartbeat_at': utcnow(), 'lease_expires_at': lease()}},
+        sort=[('created_at', 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+# Worker loop for JOB_EXECUTION=worker: claims queued jobs and runs up to `workers` at a time.
+# With once=True it returns when no job is waiting.
+def run_jobs(workers=None, poll_seconds=1.0, once=False, log=print):
+    workers = workers or JOB_WORKERS
+    running = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-worker') as pool:
+        while True:
+            running = {future for future in running if not future.done()}
+            job = claim_job() if len(running) < workers else None
+            if job is not None:
+                hold_job(job['_id'])
+                log(f"Running {job['type']} job {job['_id']}")
+                running.add(pool.submit(run_job, job['_id']))
+                continue
+            expire_stale_jobs()
+            if once and not running:
+                return
+            time.sleep(poll_seconds)
+
+# Job state. With wait > 0 the call long-polls: it returns as soon as the job finishes, or after
+# wait seconds (capped at MAX_JOB_WAIT_SECONDS) with the state at that moment.
+def get_job(job_id, wait=0):
+    deadline = time.monotonic() + min(max(wait, 0), MAX_JOB_WAIT_SECONDS)
+    while True:
+        expire_stale_jobs({'_id': job_id})
+        job = job_collection.find_one({'_id': job_id})
+        if not job:
+            return {'error': 'Job not found'}
+        remaining = deadline - time.monotonic()
+        if job['status'] in ('completed', 'failed') or remaining <= 0:
+            return job_to_dict(job)
+        with job_events_lock:
+            event = job_events.get(job_id)
+        if event:
+            # finished by this process: woken up right away
+            event.wait(remaining)
+        else:
+            # running elsewhere: fall back to polling the collection
+            time.sleep(min(0.5, remaining))
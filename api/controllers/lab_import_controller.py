@@ -0,0 +1,311 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import hashlib
+import io
+import multiprocessing
+import os
+import time
+import zipfile
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+from controllers.diagnose_controller import invalidate_predictions
+from controllers.job_controller import job_handler, submit_job
+from controllers.lab_report_controller import save_lab_reports, migrate_patients_before_merge
+from controllers.patient_controller import (
+    LOCAL_LAB_PARSER, patient_collection, lab_report_cache, extract_lab_report_with_llm, create_patients, lab_report_filter,
+    lab_report_update, lab_report_fields, store_criticality_scores
+)
+from models.lab_report import LabReport
+from services.criticality import CRITICALITY_FIELDS
+from services.lab_report_cache import sha256_hex, text_fingerprint
+from services.lab_report_parser import parse_lab_report
+from services.pdf_ingest import MAX_LAB_REPORT_BYTES, read_upload, extract_text_from_pdf_bytes, store_lab_report
+
+MAX_LAB_IMPORT_BYTES = int(os.getenv('MAX_LAB_IMPORT_BYTES', 200 * 1024 * 1024))
+MAX_LAB_IMPORT_FILES = int(os.getenv('MAX_LAB_IMPORT_FILES', 500))
+LAB_IMPORT_WORKERS = int(os.getenv('LAB_IMPORT_WORKERS', os.cpu_count() or 1))
+LAB_IMPORT_LLM_CONCURRENCY = int(os.getenv('LAB_IMPORT_LLM_CONCURRENCY', 4))
+
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+# Uncompressed bytes an import may read across all its files; every PDF is held in memory
+MAX_LAB_IMPORT_EXPANDED_BYTES = int(os.getenv('MAX_LAB_IMPORT_EXPANDED_BYTES', 2 * MAX_LAB_IMPORT_BYTES))
+
+# (filename, bytes, None) for every PDF in an upload, expanding ZIP archives; entries that cannot
+# be read come back as (filename, None, error). budget ({'files', 'bytes'}) is what the import may
+# still read: an archive is checked against the sizes it declares before anything is
+# decompressed, every read is bounded by what is left, and reading stops once it runs out.
+def expand_upload(filename, data, budget):
+    if not zipfile.is_zipfile(io.BytesIO(data)):
+        error = budget_error(budget, len(data))
+        if error:
+            return [(filename, None, error)]
+        take_budget(budget, len(data))
+        return [(filename, data, None)]
+    entries = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and not info.filename.startswith('__MACOSX/') and info.filename.lower().endswith('.pdf')
+        ]
+        if sum(info.file_size for info in members[:max(budget['files'], 0)]) > budget['bytes']:
+            return [(filename, None, f'Import expands to more than {MAX_LAB_IMPORT_EXPANDED_BYTES} bytes')]
+        for i, info in enumerate(members):
+            name = info.filename
+            error = budget_error(budget, info.file_size)
+            if error:
+                entries.append((name if budget['files'] > 0 else filename, None, error))
+                if budget['files'] <= 0:
+                    break
+                continue
+            try:
+                # file_size comes from the archive and can lie; the read itself is bounded too
+                if info.file_size > MAX_LAB_REPORT_BYTES:
+                    raise RequestEntityTooLarge(f'Lab report exceeds {MAX_LAB_REPORT_BYTES} bytes')
+                with archive.open(info) as member:
+                    pdf_bytes = read_upload(member, min(MAX_LAB_REPORT_BYTES, budget['bytes']))
+                take_budget(budget, len(pdf_bytes))
+                entries.append((name, pdf_bytes, None))
+            except Exception as e:
+                entries.append((name, None, getattr(e, 'description', str(e))))
+    return entries
+
+def budget_error(budget, size):
+    if budget['files'] <= 0:
+        return f'More than {MAX_LAB_IMPORT_FILES} files in one import; the rest was not read'
+    if size > budget['bytes']:
+        return f'Import expands to more than {MAX_LAB_IMPORT_EXPANDED_BYTES} bytes'
+    return None
+
+def take_budget(budget, size):
+    budget['files'] -= 1
+    budget['bytes'] -= size
+
+# Outcome indexes whose snapshot update did not land, with the reason, for an ordered bulk write
+# of one update per index that failed part way: the server stops at the first write error, so
+# every update before it was applied and none after it was sent.
+def bulk_write_failures(indexes, error):
+    write_errors = error.details.get('writeErrors') or []
+    failures = {indexes[write_error['index']]: write_error.get('errmsg') or 'Write failed' for write_error in write_errors}
+    first = min((write_error['index'] for write_error in write_errors), default=len(indexes))
+    for i in indexes[first + 1:]:
+        failures.setdefault(i, 'Not merged: an earlier update of this import failed')
+    return failures
+
+# patient id for a file: the explicit mapping, otherwise the file name without its extension
+def patient_id_for(filename, mapping):
+    if mapping and filename in mapping:
+        return mapping[filename]
+    base = os.path.basename(filename)
+    if mapping and base in mapping:
+        return mapping[base]
+    return secure_filename(os.path.splitext(base)[0]) or None
+
+def extract_texts(items, workers):
+    if not items:
+        return []
+    if workers <= 1 or len(items) == 1:
+        return [timed_extract(data) for data in items]
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(items)), mp_context=context) as pool:
+        return list(pool.map(timed_extract, items, chunksize=max(1, len(items) // (workers * 4))))
+
+# runs in the extraction pool: (template, parsed report, text, error, ms); reports in a known
+# layout come back parsed, the rest as text for the LLM
+def timed_extract(data):
+    start = time.perf_counter()
+    try:
+        if LOCAL_LAB_PARSER:
+            template, result = parse_lab_report(data)
+            if result is not None:
+                return template, result, None, None, elapsed_ms(start)
+        return None, None, extract_text_from_pdf_bytes(data), None, elapsed_ms(start)
+    except Exception as e:
+        return None, None, None, str(e), elapsed_ms(start)
+
+def timed_llm(text):
+    start = time.perf_counter()
+    try:
+        return extract_lab_report_with_llm(text), None, elapsed_ms(start)
+    except Exception as e:
+        return None, str(e), elapsed_ms(start)
+
+# Import many lab reports at once. files is a list of (filename, bytes), each a PDF or a ZIP of
+# PDFs. Text extraction runs in a process pool, LLM calls run with bounded concurrency, and the
+# parsed reports are merged with one bulk write for all the patients involved.
+# Returns a per-file report with the timings of every stage.
+def import_lab_reports(files, mapping=None, workers=None, llm_concurrency=None):
+    if mapping is not None and not isinstance(mapping, dict):
+        return {'error': 'mapping must be a JSON object'}
+    workers = LAB_IMPORT_WORKERS if workers is None else workers
+    llm_concurrency = LAB_IMPORT_LLM_CONCURRENCY if llm_concurrency is None else llm_concurrency
+    total_start = time.perf_counter()
+    timings = {}
+
+    start = time.perf_counter()
+    outcomes = []
+    payloads = []
+    budget = {'files': MAX_LAB_IMPORT_FILES, 'bytes': MAX_LAB_IMPORT_EXPANDED_BYTES}
+    for filename, data in files:
+        for name, pdf_bytes, error in expand_upload(filename, data, budget):
+            outcome = {'filename': name, 'patient_id': patient_id_for(name, mapping), 'status': 'pending', 'timings': {}}
+            if error:
+                outcome.update(status='failed', error=error)
+            elif not outcome['patient_id']:
+                outcome.update(status='failed', error='No patient id for file')
+            outcomes.append(outcome)
+            payloads.append(pdf_bytes if outcome['status'] == 'pending' else None)
+    timings['read_ms'] = elapsed_ms(start)
+
+    # the same file twice for the same patient is merged once
+    start = time.perf_counter()
+    seen = {}
+    for i, outcome in enumerate(outcomes):
+        if outcome['status'] != 'pending':
+            continue
+        outcome['pdf_sha256'] = sha256_hex(payloads[i])
+        key = (outcome['patient_id'], outcome['pdf_sha256'])
+        if key in seen:
+            outcome.update(status='skipped', error=f"Duplicate of {outcomes[seen[key]]['filename']}")
+            payloads[i] = None
+        else:
+            seen[key] = i
+            store_lab_report(outcome['patient_id'], payloads[i])
+
+    results = {}
+    need_text = []
+    for i in seen.values():
+        result = lab_report_cache.lookup_pdf(outcomes[i]['pdf_sha256'])
+        if result is not None:
+            results[i] = result
+            outcomes[i]['source'] = 'cache'
+        else:
+            need_text.append(i)
+    timings['cache_ms'] = elapsed_ms(start)
+
+    start = time.perf_counter()
+    texts = {}
+    seen_text = {}
+    for i, (template, parsed, text, error, ms) in zip(need_text, extract_texts([payloads[i] for i in need_text], workers)):
+        outcomes[i]['timings']['extract_ms'] = ms
+        if error:
+            outcomes[i].update(status='failed', error=error)
+            continue
+        if parsed is not None:
+            results[i] = parsed
+            outcomes[i]['source'] = f'template:{template}'
+            continue
+        text_sha256 = text_fingerprint(text)
+        key = (outcomes[i]['patient_id'], text_sha256)
+        if key in seen_text:
+            outcomes[i].update(status='skipped', error=f"Same report as {outcomes[seen_text[key]]['filename']}")
+            continue
+        seen_text[key] = i
+        result = lab_report_cache.lookup_text(text_sha256, outcomes[i]['pdf_sha256'])
+        if result is not None:
+            results[i] = result
+            outcomes[i]['source'] = 'cache'
+        else:
+            texts.setdefault(text_sha256, (text, []))[1].append(i)
+    timings['extract_ms'] = elapsed_ms(start)
+
+    # one LLM call per distinct text, even when several patients share it
+    start = time.perf_counter()
+    if texts:
+        text_keys = list(texts)
+        with ThreadPoolExecutor(max_workers=max(1, llm_concurrency)) as pool:
+            parsed = list(pool.map(timed_llm, [texts[key][0] for key in text_keys]))
+        for text_sha256, (result, error, ms) in zip(text_keys, parsed):
+            indexes = texts[text_sha256][1]
+            for i in indexes:
+                outcomes[i]['timings']['llm_ms'] = ms
+                if error:
+                    outcomes[i].update(status='failed', error=error)
+                    continue
+                lab_report_cache.put(outcomes[i]['pdf_sha256'], text_sha256, result)
+                results[i] = result
+                outcomes[i]['source'] = 'llm'
+    timings['llm_ms'] = elapsed_ms(start)
+
+    # every report is kept in lab_reports; the patient snapshots get one conditional update per
+    # report, oldest first, all sent in one ordered bulk write after the new patients are created
+    start = time.perf_counter()
+    reports = {
+        i: LabReport.from_result(outcomes[i]['patient_id'], results[i], outcomes[i]['pdf_sha256'], outcomes[i]['source'])
+        for i in sorted(results)
+    }
+    order = sorted(results, key=lambda i: reports[i].reported_at)
+    by_patient = {}
+    for i in order:
+        by_patient.setdefault(outcomes[i]['patient_id'], []).append(i)
+    if by_patient:
+        failures = {}
+        try:
+            migrate_patients_before_merge(by_patient)
+            save_lab_reports(list(reports.values()))
+            create_patients(by_patient)
+        except Exception as e:
+            failures = {i: str(e) for i in order}
+        else:
+            try:
+                # ordered, so the reports of a patient reach its snapshot in the order they were reported
+                patient_collection.bulk_write([
+                    UpdateOne(
+                        lab_report_filter(outcomes[i]['patient_id'], reports[i].reported_at),
+                        lab_report_update(results[i], reports[i].reported_at)
+                    )
+                    for i in order
+                ], ordered=True)
+            except BulkWriteError as e:
+                # the reports are all in lab_reports; only the snapshot updates after the error are missing
+                failures = bulk_write_failures(order, e)
+            except Exception as e:
+                failures = {i: str(e) for i in order}
+
+        merged = {}
+        for i in order:
+            if i in failures:
+                outcomes[i].update(status='failed', error=failures[i])
+            else:
+                outcomes[i]['status'] = 'merged'
+                merged.setdefault(outcomes[i]['patient_id'], []).append(i)
+        for patient_id, indexes in merged.items():
+            invalidate_predictions(patient_id, [field for i in indexes for field in lab_report_fields(results[i])])
+        if merged:
+            store_criticality_scores(list(patient_collection.find(
+                {'patient_id': {'$in': list(merged)}},
+                {'criticality_score': 1, 'criticality_fingerprint': 1, **{field: 1 for field in CRITICALITY_FIELDS}}
+            )))
+    timings['merge_ms'] = elapsed_ms(start)
+    timings['total_ms'] = elapsed_ms(total_start)
+
+    summary = {'files': len(outcomes), 'patients': len(by_patient)}
+    for outcome in outcomes:
+        summary[outcome['status']] = summary.get(outcome['status'], 0) + 1
+    return {'summary': summary, 'timings': timings, 'files': outcomes}
+
+@job_handler('lab_import')
+def run_lab_import_job(params, files):
+    return import_lab_reports(files, dict(params.get('mapping') or []))
+
+# queue an import as a background job; the same set of files is only imported once at a time
+def submit_lab_import_job(files, mapping=None):
+    digest = hashlib.sha256()
+    for filename, data in files:
+        digest.update(filename.encode('utf-8'))
+        digest.update(sha256_hex(data).encode('ascii'))
+    job, created = submit_job(
+        'lab_import',
+        digest.hexdigest(),
+        # file names contain dots, so the mapping is kept as pairs rather than as a document
+        {'mapping': list((mapping or {}).items())},
+        files,
+        {'filenames': [filename for filename, _ in files]}
+    )
+    job['duplicate'] = not created
+    return job
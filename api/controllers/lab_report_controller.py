@@ -0,0 +1,133 @@
+import datetime
+import time
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from models.lab_report import LabReport
+from utils.db import db
+
+# MongoDB collections, on the shared client
+lab_report_collection = db['lab_reports']
+patient_collection = db['patients']
+
+# Every parsed report is kept as its own document; the patient document only holds the latest
+# snapshot of vitals, lab results and anomalies. Their indexes are in services/indexes.py.
+
+def lab_report_operation(report):
+    report = report.to_dict()
+    return UpdateOne({'patient_id': report['patient_id'], 'report_id': report['report_id']}, {'$setOnInsert': report}, upsert=True)
+
+# store LabReport objects, all in one bulk write
+def save_lab_reports(reports):
+    if not reports:
+        return
+    lab_report_collection.bulk_write([lab_report_operation(report) for report in reports], ordered=False)
+
+# A page of a patient's history ends at a (reported_at, _id) pair, so reports printed at the same
+# time are neither repeated nor skipped across pages. The cursor is "<ISO reported_at>_<_id>".
+def history_cursor(report):
+    reported_at = report.get('reported_at')
+    return f"{reported_at.isoformat() if reported_at else ''}_{report['_id']}"
+
+def parse_history_cursor(cursor):
+    reported_at, _, report_oid = cursor.rpartition('_')
+    if not ObjectId.is_valid(report_oid):
+        raise ValueError('cursor must be a next_cursor returned by a previous page')
+    try:
+        reported_at = datetime.datetime.fromisoformat(reported_at) if reported_at else None
+    except ValueError:
+        raise ValueError('cursor must be a next_cursor returned by a previous page')
+    return reported_at, ObjectId(report_oid)
+
+# Reports of a patient, newest first. cursor (the next_cursor of the previous page) pages further back.
+def get_lab_report_history(patient_id, cursor=None, limit=20):
+    query = {'patient_id': patient_id}
+    if cursor is not None:
+        reported_at, report_oid = parse_history_cursor(cursor)
+        same_time = {'reported_at': reported_at, '_id': {'$lt': report_oid}}
+        # reports without a date sort after every dated one
+        query['$or'] = [{'reported_at': {'$lt': reported_at}}, same_time, {'reported_at': None}] if reported_at else [same_time]
+    reports = list(lab_report_collection.find(query).sort([('reported_at', -1), ('_id', -1)]).limit(limit))
+    next_cursor = history_cursor(reports[-1]) if len(reports) == limit else None
+    for report in reports:
+        report.pop('_id')
+    return {'reports': reports, 'next_cursor': next_cursor}
+
+def delete_lab_reports(patient_id):
+    lab_report_collection.delete_many({'patient_id': patient_id})
+
+# anomalies of every report of a patient, oldest first, or None when it has no stored reports
+def get_lab_report_anomalies(patient_id):
+    anomalies = []
+    found = False
+    for report in lab_report_collection.find({'patient_id': patient_id}, {'_id': 0, 'data.anomalies': 1}).sort('reported_at', 1):
+        found = True
+        anomalies.extend((report.get('data') or {}).get('anomalies') or [])
+    return anomalies if found else None
+
+
+# LabReport documents for the report data embedded in a patient document: one per entry of the
+# legacy lab_reports array, and one holding the accumulated vitals, lab results and anomalies.
+# When the embedded data was reported is unknown; it is dated at the creation of the patient
+# document, the earliest it can be from, so it sorts before every report stored since.
+def embedded_lab_reports(patient):
+    patient_id = patient['patient_id']
+    created_at = None
+    if isinstance(patient['_id'], ObjectId):
+        created_at = patient['_id'].generation_time.replace(tzinfo=None)
+    reports = []
+    for i, entry in enumerate(patient.get('lab_reports') or []):
+        if not isinstance(entry, dict):
+            continue
+        data = {'anomalies': entry.get('anomalies') or [], 'lab_report_text': entry.get('lab_report_text')}
+        reports.append(LabReport(f"migrated:{i}:{entry.get('report_id')}", patient_id, None, created_at, data, 'migrated'))
+    data = {section: patient.get(section) or {} for section in ('patient_info', 'vitals', 'lab_results')}
+    data['anomalies'] = patient.get('anomalies') or []
+    if data['vitals'] or data['lab_results'] or data['anomalies']:
+        reports.append(LabReport('migrated:snapshot', patient_id, None, created_at, data, 'migrated'))
+    return reports
+
+MIGRATION_PROJECTION = {'_id': 1, 'patient_id': 1, 'patient_info': 1, 'vitals': 1, 'lab_results': 1, 'anomalies': 1, 'lab_reports': 1}
+NOT_MIGRATED = {'lab_reports_migrated_at': {'$exists': False}, 'patient_id': {'$exists': True}}
+
+# Store the embedded report data of patient documents in lab_reports and mark the patients as
+# migrated; the legacy lab_reports array (with the full text of each report) is removed.
+def migrate_patients(patients):
+    reports = [report for patient in patients for report in embedded_lab_reports(patient)]
+    save_lab_reports(reports)
+    migrated_at = datetime.datetime.utcnow()
+    patient_collection.bulk_write([
+        UpdateOne({'_id': patient['_id']}, {'$set': {'lab_reports_migrated_at': migrated_at}, '$unset': {'lab_reports': ''}})
+        for patient in patients
+    ], ordered=False)
+    return reports
+
+# Called before a new report is merged into patients: those not migrated yet get their embedded
+# data moved first, so replacing the snapshot loses nothing. Patients created since the
+# lab_reports collection exists are marked on insert and cost a single indexed lookup.
+def migrate_patients_before_merge(patient_ids):
+    patients = list(patient_collection.find({**NOT_MIGRATED, 'patient_id': {'$in': list(patient_ids)}}, MIGRATION_PROJECTION))
+    if patients:
+        migrate_patients(patients)
+
+# Move the report data embedded in patient documents into lab_reports, batch_size patients at a
+# time. Migrated patients are marked, so the migration can be interrupted and run again.
+def migrate_lab_reports(batch_size=500, dry_run=False, log=print):
+    summary = {'patients': 0, 'reports': 0, 'dry_run': dry_run}
+    start = time.perf_counter()
+    last_id = None
+    while True:
+        query = NOT_MIGRATED if last_id is None else {**NOT_MIGRATED, '_id': {'$gt': last_id}}
+        patients = list(patient_collection.find(query, MIGRATION_PROJECTION).sort('_id', 1).limit(batch_size))
+        if not patients:
+            break
+        last_id = patients[-1]['_id']
+        if dry_run:
+            reports = [report for patient in patients for report in embedded_lab_reports(patient)]
+        else:
+            reports = migrate_patients(patients)
+        summary['patients'] += len(patients)
+        summary['reports'] += len(reports)
+        log(f"{summary['patients']} patients, {summary['reports']} reports {'found' if dry_run else 'migrated'}")
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    return summary
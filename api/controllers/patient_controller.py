@@ -1,24 +1,32 @@
 from flask import jsonify, request
-from pymongo import MongoClient, UpdateOne
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+import datetime
 import os
 import json
 from dotenv import load_dotenv
-import fitz  # PyMuPDF
-import google.generativeai as genai
 import re
+import numpy as np
 from bson import ObjectId
 
 from controllers.allocation_controller import deallocate_resource_from_patient, unassign_staff_from_patient
+from controllers.diagnose_controller import invalidate_predictions
+from controllers.job_controller import job_handler, submit_job
+from controllers.lab_report_controller import lab_report_collection, save_lab_reports, get_lab_report_anomalies, delete_lab_reports, migrate_patients_before_merge
+from models.lab_report import LabReport
+from services.pdf_ingest import read_upload, extract_text_from_pdf_bytes, store_lab_report
+from services.lab_report_cache import LabReportCache, sha256_hex, text_fingerprint
+from services.lab_report_parser import parse_lab_report
+from services.gemini_client import generative_model
+from services.trends import TREND_WINDOWS, metric_value, downsample
+from services.criticality import CRITICALITY_FIELDS, criticality_scores, criticality_fingerprint, criticality_fields, top_k, unchanged_inputs_filter
+from utils.db import db
+
 load_dotenv()
 
-# MongoDB connection
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client['dev-db']
+# MongoDB collections, on the shared client
 patient_collection = db['patients']
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
 def split_and_load_ejson(text):
     # Regular expression to find triple backticks with 'json' inside
     pattern = r"```json(.*?)```"
@@ -39,25 +47,8 @@ def split_and_load_ejson(text):
         print("Error: No valid JSON block found using triple backticks")
         return None
 
-def extract_text_from_pdf(filepath):
-    doc = fitz.open(filepath)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
-
-def upload_lab_report(patient_id, file):
-    try:
-        # Save the file
-        filename = file.filename
-        filepath = os.path.join('uploads', filename)
-        file.save(filepath)
-
-        # Extract text from the PDF
-        pdf_text = extract_text_from_pdf(filepath)
-
-        # Create prompt with extracted text
-        prompt = f"""Extract patient info, anomalies, vitals and lab results from the following lab report text: 
+def build_lab_report_prompt(pdf_text):
+    return f"""Extract patient info, anomalies, vitals and lab results from the following lab report text: 
         {pdf_text}. 
         Output format:
         {{
@@ -96,106 +87,270 @@ def upload_lab_report(patient_id, file):
         6. The naming should be as follows: ['gender', 'smoking_history', 'age', 'hypertension', 'heart_disease', 'bmi', 'HbA1c_level', 'blood_glucose_level', 'Sex', 'ChestPainType', 'RestingECG', 'ExerciseAngina', 'ST_Slope', 'Age', 'RestingBP', 'Cholesterol', 'MaxHR', 'Oldpeak', 'gender', 'ever_married', 'work_type', 'Residence_type', 'smoking_status', 'age', 'hypertension', 'heart_disease', 'avg_glucose_level', 'bmi'] 
         if any readings from the report indicate the above value but are named differently, rename them to match the above names."""
 
-        # Interact with Gemini API
-        model = genai.GenerativeModel(model_name="models/gemini-1.5-flash")
-        response = model.generate_content([prompt])
-
-        # Parse JSON from the response text using regex-based function
-        response_text = response.candidates[0].content.parts[0].text.strip()
-        print(f"Response from Gemini API: {response_text}")
-
-        if not response_text:
-            return {'error': 'Empty response from API'}
-
-        # Use regex-based function to parse JSON response
-        result = split_and_load_ejson(response_text)
-
-        if not result:
-            return {'error': 'Failed to parse JSON response'}
-
-        print(f"Extracted JSON: {result}")
-
-        # Extract patient info, anomalies, vitals, and lab results from parsed JSON
-        patient_info = result.get('patient_info', {})
-        anomalies = result.get('anomalies', [])
-        vitals = result.get('vitals', {})
-        lab_results = result.get('lab_results', {})
-
-        # Retrieve the existing patient data
-        existing_patient_data = patient_collection.find_one({'patient_id': patient_id})
-        
-        if existing_patient_data:
-            # Update existing patient data with new values
-            existing_patient_data['patient_info'] = {**existing_patient_data.get('patient_info', {}), **patient_info}
-            existing_patient_data['anomalies'] = existing_patient_data.get('anomalies', []) + anomalies
-            existing_patient_data['vitals'] = {**existing_patient_data.get('vitals', {}), **vitals}
-            existing_patient_data['lab_results'] = {**existing_patient_data.get('lab_results', {}), **lab_results}
-        else:
-            # Create new patient data if none exists
-            existing_patient_data = {
-                'patient_id': patient_id,
-                'patient_info': patient_info,
-                'anomalies': anomalies,
-                'vitals': vitals,
-                'lab_results': lab_results,
-                'staffs_assigned': [],
-                'resources_allocated': [],
-                'notifications': [],
-                'isEmergency': False,
-                'takenPills': True
-            }
+LAB_REPORT_MODEL = "models/gemini-1.5-flash"
+LOCAL_LAB_PARSER = os.getenv('LOCAL_LAB_PARSER', '1') != '0'
+
+# parsed sections of a lab report from the LLM
+def extract_lab_report_with_llm(pdf_text):
+    # Interact with Gemini API
+    model = generative_model(LAB_REPORT_MODEL)
+    response = model.generate_content([build_lab_report_prompt(pdf_text)])
+
+    # Parse JSON from the response text using regex-based function
+    response_text = response.candidates[0].content.parts[0].text.strip()
+    print(f"Response from Gemini API: {response_text}")
+
+    if not response_text:
+        raise ValueError('Empty response from API')
+
+    # Use regex-based function to parse JSON response
+    result = split_and_load_ejson(response_text)
+
+    if not result:
+        raise ValueError('Failed to parse JSON response')
+
+    print(f"Extracted JSON: {result}")
+    return result
+
+# cache entries are only valid for the model and prompt that produced them
+lab_report_cache = LabReportCache(
+    db['lab_report_cache'],
+    db['cache_stats'],
+    f"{LAB_REPORT_MODEL}:{sha256_hex(build_lab_report_prompt(''))[:12]}"
+)
+
+# parsed lab report for the PDF bytes. Known layouts are parsed locally; otherwise identical
+# files and identical text are served from the cache and only new reports reach the LLM
+def extract_lab_report(pdf_bytes):
+    if LOCAL_LAB_PARSER:
+        template, result = parse_lab_report(pdf_bytes)
+        if result is not None:
+            return result
+
+    pdf_sha256 = sha256_hex(pdf_bytes)
+    result = lab_report_cache.lookup_pdf(pdf_sha256)
+    if result is not None:
+        return result
+
+    # Extract text from the PDF in memory
+    pdf_text = extract_text_from_pdf_bytes(pdf_bytes)
+    text_sha256 = text_fingerprint(pdf_text)
+    result = lab_report_cache.lookup_text(text_sha256, pdf_sha256)
+    if result is not None:
+        return result
+
+    result = extract_lab_report_with_llm(pdf_text)
+    lab_report_cache.put(pdf_sha256, text_sha256, result)
+    return result
+
+# defaults of a patient created by its first lab report
+NEW_PATIENT_DEFAULTS = {
+    'staffs_assigned': [],
+    'resources_allocated': [],
+    'notifications': [],
+    'isEmergency': False,
+    'takenPills': True
+}
+
+# field names are used as update paths, where '.' and a leading '$' have a meaning of their own
+def safe_field_name(name):
+    name = str(name).replace('.', '_')
+    return '_' + name[1:] if name.startswith('$') else name
+
+# A patient created for its first lab report, with empty sections for the report to be merged into
+def new_patient_update(patient_id):
+    return {'$setOnInsert': {
+        'patient_id': patient_id,
+        **NEW_PATIENT_DEFAULTS,
+        'patient_info': {},
+        'vitals': {},
+        'lab_results': {},
+        'anomalies': [],
+        # a new patient has nothing embedded to migrate into lab_reports
+        'lab_reports_migrated_at': datetime.datetime.utcnow()
+    }}
+
+# create the patients that do not exist yet, all in one bulk write
+def create_patients(patient_ids):
+    operations = [UpdateOne({'patient_id': patient_id}, new_patient_update(patient_id), upsert=True) for patient_id in patient_ids]
+    if not operations:
+        return
+    try:
+        patient_collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # a concurrent merge created the same patient first
+        if e.details.get('writeConcernErrors') or any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+            raise
+
+# Reports reach the snapshot in the order they were reported, not received: a report is applied
+# only when it is at least as recent as the latest one applied, so a report arriving late is kept
+# in lab_reports without overwriting the newer values on the patient.
+def lab_report_filter(patient_id, reported_at):
+    return {
+        'patient_id': patient_id,
+        '$or': [{'latest_reported_at': {'$lte': reported_at}}, {'latest_reported_at': {'$exists': False}}]
+    }
 
-        # Store updated patient data in MongoDB
-        patient_collection.update_one({'patient_id': patient_id}, {'$set': existing_patient_data}, upsert=True)
+# The update applying a parsed report to the latest snapshot on a patient: keys are set by dotted
+# path, so concurrent merges into the same document never overwrite each other's values, and
+# anomalies are those of the report. The reports themselves are kept in lab_reports.
+def lab_report_update(result, reported_at):
+    updates = {}
+    for section in ('patient_info', 'vitals', 'lab_results'):
+        for key, value in (result.get(section) or {}).items():
+            updates[f'{section}.{safe_field_name(key)}'] = value
+    updates['anomalies'] = result.get('anomalies') or []
+    updates['latest_reported_at'] = reported_at
+    return {'$set': updates}
+
+def apply_lab_report(patient_id, result, reported_at):
+    return patient_collection.find_one_and_update(
+        lab_report_filter(patient_id, reported_at),
+        lab_report_update(result, reported_at),
+        return_document=ReturnDocument.AFTER
+    )
 
-        # Convert ObjectId to string before returning
-        return convert_objectid_to_str(existing_patient_data)
+# fields a parsed report changes, for prediction cache invalidation
+def lab_report_fields(result):
+    return [*result.get('patient_info', {}), *result.get('vitals', {}), *result.get('lab_results', {})]
+
+def merge_lab_report(patient_id, result, report_id=None, source=None):
+    migrate_patients_before_merge([patient_id])
+    report = LabReport.from_result(patient_id, result, report_id, source)
+    save_lab_reports([report])
+    # merged on the server in one round trip; a patient that does not exist yet is created first
+    patient = apply_lab_report(patient_id, result, report.reported_at)
+    if patient is None:
+        create_patients([patient_id])
+        patient = apply_lab_report(patient_id, result, report.reported_at)
+    if patient is None:
+        # older than the report on the snapshot: only added to the history
+        return patient_collection.find_one({'patient_id': patient_id})
+    invalidate_predictions(patient_id, lab_report_fields(result))
+    store_criticality_scores([patient])
+    return patient
+
+# store, extract and merge one uploaded report
+def process_lab_report(patient_id, pdf_bytes):
+    store_lab_report(patient_id, pdf_bytes)
+    result = extract_lab_report(pdf_bytes)
+    return merge_lab_report(patient_id, result, report_id=sha256_hex(pdf_bytes))
 
+def upload_lab_report(patient_id, file):
+    # read the upload in bounded chunks; oversized files are rejected with 413
+    pdf_bytes = read_upload(file)
+    try:
+        return process_lab_report(patient_id, pdf_bytes)
     except Exception as e:
         return {'error': str(e)}
 
+@job_handler('lab_report')
+def run_lab_report_job(params, files):
+    _, pdf_bytes = files[0]
+    return process_lab_report(params['patient_id'], pdf_bytes)
+
+# process the upload in the background; submitting the same file again while its job is
+# still queued or running returns that job instead of starting another one
+def submit_lab_report_job(patient_id, file):
+    pdf_bytes = read_upload(file)
+    pdf_sha256 = sha256_hex(pdf_bytes)
+    job, created = submit_job(
+        'lab_report',
+        f'{patient_id}:{pdf_sha256}',
+        {'patient_id': patient_id},
+        [(file.filename, pdf_bytes)],
+        {'patient_id': patient_id, 'pdf_sha256': pdf_sha256, 'filename': file.filename}
+    )
+    job['duplicate'] = not created
+    return job
+
+def get_lab_report_cache_stats():
+    return lab_report_cache.stats()
+
 def get_patient_details(patient_id):
     patient = patient_collection.find_one({'patient_id': patient_id})
     if patient:
-        # Convert ObjectId to string before returning
-        return convert_objectid_to_str(patient)
+        return patient
     else:
         return {'error': 'Patient not found'}
 
+DEFAULT_TREND_METRICS = ['HbA1c_level', 'blood_glucose_level', 'Hemoglobin', 'RestingBP']
+MAX_TREND_METRICS = 20
+MAX_TREND_POINTS = 2000
+
+def epoch_ms(value):
+    return int(value.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+# Time series of report values for a patient. Each metric is read from the lab results, or else
+# the vitals, of every report reported between since and until; only those fields are fetched.
+# The series are bucketed per window (raw, day or week) and capped at max_points, see
+# services.trends. Times are epoch milliseconds.
+def get_patient_trends(patient_id, metrics=None, window='raw', max_points=200, since=None, until=None):
+    metrics = metrics or DEFAULT_TREND_METRICS
+    if window not in TREND_WINDOWS:
+        raise ValueError(f"window must be one of {', '.join(TREND_WINDOWS)}")
+    if len(metrics) > MAX_TREND_METRICS:
+        raise ValueError(f'At most {MAX_TREND_METRICS} metrics per request')
+    if max_points < 1 or max_points > MAX_TREND_POINTS:
+        raise ValueError(f'max_points must be between 1 and {MAX_TREND_POINTS}')
+
+    fields = {metric: safe_field_name(metric) for metric in metrics}
+    projection = {'_id': 0, 'reported_at': 1}
+    for field in fields.values():
+        projection[f'data.lab_results.{field}'] = 1
+        projection[f'data.vitals.{field}'] = 1
+    query = {'patient_id': patient_id, 'reported_at': {'$type': 'date'}}
+    if since is not None:
+        query['reported_at']['$gte'] = since
+    if until is not None:
+        query['reported_at']['$lte'] = until
+
+    times = []
+    values = {metric: [] for metric in metrics}
+    for report in lab_report_collection.find(query, projection).sort('reported_at', 1):
+        data = report.get('data') or {}
+        lab_results = data.get('lab_results') or {}
+        vitals = data.get('vitals') or {}
+        times.append(epoch_ms(report['reported_at']))
+        for metric, field in fields.items():
+            value = lab_results.get(field, vitals.get(field))
+            values[metric].append(np.nan if value is None else metric_value(value))
+
+    return {
+        'patient_id': patient_id,
+        'window': window,
+        'reports': len(times),
+        'series': {metric: downsample(times, values[metric], window, max_points) for metric in metrics}
+    }
+
+# anomalies of all the patient's reports; patients whose reports predate the lab_reports
+# collection and are not migrated yet still have them on the patient document
 def get_lab_reports(patient_id):
-    patient = patient_collection.find_one({'patient_id': patient_id})
+    anomalies = get_lab_report_anomalies(patient_id)
+    if anomalies is not None:
+        return anomalies
+    patient = patient_collection.find_one({'patient_id': patient_id}, {'anomalies': 1})
     if patient:
-        # Convert ObjectId to string before returning
-        return convert_objectid_to_str(patient.get('anomalies', []))
+        return patient.get('anomalies', [])
     else:
         return {'error': 'Patient not found or no lab reports available'}
 
-from bson import ObjectId
-
-def convert_objectid_to_str(data):
-    if isinstance(data, list):
-        return [convert_objectid_to_str(item) for item in data]
-    elif isinstance(data, dict):
-        return {key: convert_objectid_to_str(value) for key, value in data.items()}
-    elif isinstance(data, ObjectId):
-        return str(data)
-    else:
-        return data
-
 
 def manual_input(patient_id, data):
     # add data to the manual_data field, do not overwrite existing data
-    patient = patient_collection.find_one({'patient_id': patient_id})
-    if patient:
-        existing_manual_data = patient.get('manual_data', {})
-        update_query = {'patient_id': patient_id}
-        # if the key already exists, it will be overwritten
-        update_data = {'$set': {'manual_data': {**existing_manual_data, **data}}}
-        
-        # Using update_one to update the document
-        patient_collection.update_one(update_query, update_data)
-        
+    # if the key already exists, it will be overwritten
+    update_data = {'$set': {f'manual_data.{safe_field_name(key)}': value for key, value in data.items()}}
+    if not update_data['$set']:
         return get_patient_details(patient_id)
+    patient = patient_collection.find_one_and_update(
+        {'patient_id': patient_id},
+        update_data,
+        return_document=ReturnDocument.AFTER
+    )
+    if patient:
+        invalidate_predictions(patient_id, data)
+        store_criticality_scores([patient])
+        return patient
     else:
         return {'error': 'Patient not found'}
 
@@ -325,20 +480,122 @@ def calculate_criticality_score(patient_data):
     return criticality_score
 
 
+# Recompute and store the score of patient documents whose score inputs changed since it was
+# last stored. Called by every write that touches the inputs, so stored scores stay current and
+# reads never have to recompute them. The documents are updated in place. Each score is only
+# stored while the document still holds the inputs it was computed from: when writes overlap,
+# the writer whose snapshot is the latest is the one whose score lands.
+def store_criticality_scores(patients):
+    patients = [patient for patient in patients if patient]
+    if not patients:
+        return
+    operations = []
+    for patient, score in zip(patients, criticality_scores(patients)):
+        fingerprint = criticality_fingerprint(patient)
+        if patient.get('criticality_fingerprint') == fingerprint and 'criticality_score' in patient:
+            continue
+        fields = criticality_fields(patient, score, fingerprint)
+        patient.update(fields)
+        operations.append(UpdateOne({'_id': patient['_id'], **unchanged_inputs_filter(patient)}, {'$set': fields}))
+    if operations:
+        patient_collection.bulk_write(operations, ordered=False)
+
+# Score patients that have no stored score yet (written before scores were kept on write), at
+# most limit of them. They are found through the criticality_score index, where a missing score
+# is indexed as null. Returns the number scored.
+def backfill_criticality_scores(query=None, limit=5000):
+    patients = list(patient_collection.find(
+        {**(query or {}), 'criticality_score': {'$exists': False}},
+        {'criticality_score': 1, 'criticality_fingerprint': 1, **{field: 1 for field in CRITICALITY_FIELDS}}
+    ).limit(limit))
+    store_criticality_scores(patients)
+    return len(patients)
+
+# stored score; documents written before scores were kept on write are scored without storing
 def get_criticality_score(patient_id):
-    patient_data = patient_collection.find_one({'patient_id': patient_id})
+    patient_data = patient_collection.find_one(
+        {'patient_id': patient_id},
+        {'criticality_score': 1, 'criticality_updated_at': 1, **{field: 1 for field in CRITICALITY_FIELDS}}
+    )
     if patient_data:
-        criticality_score = calculate_criticality_score(patient_data)
-        # update the patient's criticality score
-        patient_collection.update_one(
-            {'patient_id': patient_id},
-            {'$set': {'criticality_score': criticality_score}}
-        )
-        return {'criticality_score': criticality_score}
+        if 'criticality_updated_at' in patient_data:
+            return {'criticality_score': patient_data.get('criticality_score'), 'criticality_updated_at': patient_data['criticality_updated_at']}
+        score = criticality_scores([patient_data])[0]
+        return {'criticality_score': None if np.isnan(score) else float(score), 'criticality_updated_at': None}
     else:
         return {'error': 'Patient not found'}
     
 
+# The k most critical patients, optionally only those assigned to a staff member and/or in a
+# ward. By default this reads the stored scores through the criticality_score index; with live
+# the patients are rescored in chunks with the vectorized score, keeping only the running top k.
+def get_triage(k=10, staff_id=None, ward=None, live=False, batch_size=5000):
+    query = {}
+    if staff_id:
+        query['staffs_assigned'] = staff_id
+    if ward:
+        query['ward'] = ward
+
+    if not live:
+        # read only: patients stored before scores were kept on write are scored by
+        # `manage.py backfill-criticality` or the rescore job, not here
+        query['criticality_score'] = {'$type': 'number'}
+        cursor = patient_collection.find(
+            query,
+            {'_id': 0, 'patient_id': 1, 'isEmergency': 1, 'patient_info.name': 1, 'criticality_score': 1, 'criticality_updated_at': 1}
+        ).sort('criticality_score', -1).limit(k)
+        patients = [
+            {
+                'rank': rank,
+                'patient_id': patient['patient_id'],
+                'name': (patient.get('patient_info') or {}).get('name'),
+                'isEmergency': patient.get('isEmergency', False),
+                'criticality_score': patient['criticality_score'],
+                'criticality_updated_at': patient.get('criticality_updated_at')
+            }
+            for rank, patient in enumerate(cursor, start=1)
+        ]
+        return {'live': False, 'patients': patients}
+
+    projection = {'_id': 0, 'patient_id': 1, 'isEmergency': 1, **{field: 1 for field in CRITICALITY_FIELDS}}
+
+    leaders = []
+    leader_scores = np.empty(0)
+    scored = 0
+
+    def add(chunk):
+        nonlocal leaders, leader_scores, scored
+        scored += len(chunk)
+        candidates = leaders + chunk
+        scores = np.concatenate([leader_scores, criticality_scores(chunk)])
+        best = top_k(scores, k)
+        leaders = [candidates[i] for i in best]
+        leader_scores = scores[best]
+
+    chunk = []
+    for patient in patient_collection.find(query, projection).batch_size(batch_size):
+        chunk.append(patient)
+        if len(chunk) >= batch_size:
+            add(chunk)
+            chunk = []
+    if chunk:
+        add(chunk)
+
+    return {
+        'live': True,
+        'scored': scored,
+        'patients': [
+            {
+                'rank': rank,
+                'patient_id': patient['patient_id'],
+                'name': (patient.get('patient_info') or {}).get('name'),
+                'isEmergency': patient.get('isEmergency', False),
+                'criticality_score': float(score)
+            }
+            for rank, (patient, score) in enumerate(zip(leaders, leader_scores), start=1)
+        ]
+    }
+
 # remove patient from the system, deallocate resources and staffs assigned
 def remove_patient(patient_id):
     # deallocate resources
@@ -351,18 +608,50 @@ def remove_patient(patient_id):
         staffs_assigned = patient.get('staffs_assigned', [])
         for staff_id in staffs_assigned:
             unassign_staff_from_patient(patient_id, staff_id)
-        # delete the patient
+        # delete the patient and the lab reports kept for it
         patient_collection.delete_one({'patient_id': patient_id})
+        delete_lab_reports(patient_id)
         return {'message': 'Patient removed successfully'}
     else:
         return {'error': 'Patient not found'}
     
 # get all patients
-def get_all_patients():
-    patients = patient_collection.find()
-    return convert_objectid_to_str(list(patients))
+MAX_PATIENT_PAGE_SIZE = int(os.getenv('MAX_PATIENT_PAGE_SIZE', 1000))
+
+def patient_projection(fields):
+    if not fields:
+        return None
+    if any(not field or field.startswith('$') for field in fields):
+        raise ValueError('Invalid field name')
+    # patient_id is the pagination key, so it is always returned
+    return {'patient_id': 1, **{field: 1 for field in fields}}
+
+# Patients matching query in patient_id order, as (cursor, next cursor). Pages are keyed on
+# patient_id: the next page starts after the next cursor, which is None on the last page.
+# The page boundary is found with an ids-only query first, so the documents themselves can be
+# streamed to the client straight from the cursor.
+def find_patients(query, fields=None, after=None, limit=None):
+    projection = patient_projection(fields)
+    if after is not None:
+        query = {**query, 'patient_id': {'$gt': after}}
+    next_cursor = None
+    if limit is not None:
+        if limit < 1 or limit > MAX_PATIENT_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {MAX_PATIENT_PAGE_SIZE}')
+        ids = [
+            patient.get('patient_id') for patient in
+            patient_collection.find(query, {'_id': 0, 'patient_id': 1}).sort('patient_id', 1).limit(limit + 1)
+        ]
+        if len(ids) > limit:
+            next_cursor = ids[limit - 1]
+    cursor = patient_collection.find(query, projection).sort('patient_id', 1)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    return cursor, next_cursor
+
+def get_all_patients(fields=None, after=None, limit=None):
+    return find_patients({}, fields, after, limit)
 
 # get patients assigned to a staff, staff_id in staffs_assigned array
-def get_patients_assigned_to_staff(staff_id):
-    patients = patient_collection.find({'staffs_assigned': staff_id})
-    return convert_objectid_to_str(list(patients))
\ No newline at end of file
+def get_patients_assigned_to_staff(staff_id, fields=None, after=None, limit=None):
+    return find_patients({'staffs_assigned': staff_id}, fields, after, limit)
\ No newline at end of file
@@ -0,0 +1,139 @@
+import datetime
+import time
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+import os
+
+from controllers.diagnose_controller import model_specs, merge_patient_data, build_model_row, predict_rows, prediction_update
+from services.criticality import criticality_scores, criticality_fields, unchanged_inputs_filter
+from services.model_registry import registry
+from utils.db import db
+
+
+load_dotenv()
+
+# MongoDB collections, on the shared client
+patient_collection = db['patients']
+checkpoint_collection = db['job_checkpoints']
+
+RESCORE_JOB_ID = 'rescore_patients'
+
+# everything the models and the criticality score read
+rescore_projection = {'_id': 1, 'patient_id': 1, 'lab_results': 1, 'vitals': 1, 'patient_info': 1, 'manual_data': 1, 'anomalies': 1}
+
+
+def model_versions():
+    versions = {}
+    for model_name in model_specs:
+        try:
+            versions[model_name] = registry.get(model_name).version
+        except FileNotFoundError:
+            versions[model_name] = None
+    return versions
+
+# predictions and criticality score for one chunk of patient documents, as bulk update operations
+def rescore_chunk(patients):
+    updates = [{} for _ in patients]
+    merged = [merge_patient_data(patient) for patient in patients]
+
+    for model_name in model_specs:
+        indexes = []
+        rows = []
+        for i, patient_data in enumerate(merged):
+            row, missing = build_model_row(model_name, patient_data)
+            if not missing:
+                indexes.append(i)
+                rows.append(row)
+        if not rows:
+            continue
+        for i, result in zip(indexes, predict_rows(model_name, rows)):
+            updates[i].update(prediction_update(model_name, result))
+
+    operations = [UpdateOne({'_id': patient['_id']}, {'$set': update}) for patient, update in zip(patients, updates) if update]
+
+    # patients the score cannot be computed for (non-numeric inputs) get null; a score is only
+    # stored while the document still holds the inputs it was computed from (a write since the
+    # chunk was read stores its own)
+    for patient, score in zip(patients, criticality_scores(patients)):
+        operations.append(UpdateOne({'_id': patient['_id'], **unchanged_inputs_filter(patient)}, {'$set': criticality_fields(patient, score)}))
+    return operations
+
+# Re-score every patient document in _id order. Progress is checkpointed after each chunk so an
+# interrupted run resumes where it stopped; max_rate (documents per second) keeps the job from
+# competing with the online request path for the database.
+def rescore_patients(batch_size=500, max_rate=None, restart=False, log=print):
+    checkpoint = checkpoint_collection.find_one({'_id': RESCORE_JOB_ID})
+    if restart or not checkpoint or checkpoint.get('status') == 'completed':
+        checkpoint = {
+            '_id': RESCORE_JOB_ID,
+            'status': 'running',
+            'last_id': None,
+            'processed': 0,
+            'started_at': datetime.datetime.now(),
+            'model_versions': model_versions()
+        }
+        checkpoint_collection.replace_one({'_id': RESCORE_JOB_ID}, checkpoint, upsert=True)
+    else:
+        log(f"Resuming after {checkpoint['processed']} documents")
+        checkpoint_collection.update_one({'_id': RESCORE_JOB_ID}, {'$set': {'status': 'running'}})
+
+    query = {}
+    if checkpoint['last_id'] is not None:
+        query = {'_id': {'$gt': checkpoint['last_id']}}
+    cursor = patient_collection.find(query, rescore_projection).sort('_id', 1).batch_size(batch_size)
+
+    processed = checkpoint['processed']
+    run_processed = 0
+    start = time.perf_counter()
+
+    def flush(chunk):
+        nonlocal processed, run_processed
+        chunk_start = time.perf_counter()
+        operations = rescore_chunk(chunk)
+        patient_collection.bulk_write(operations, ordered=False)
+        processed += len(chunk)
+        run_processed += len(chunk)
+        checkpoint_collection.update_one(
+            {'_id': RESCORE_JOB_ID},
+            {'$set': {'last_id': chunk[-1]['_id'], 'processed': processed, 'updated_at': datetime.datetime.now()}}
+        )
+        elapsed = time.perf_counter() - start
+        log(f"{processed} documents rescored, {run_processed / elapsed:.1f} docs/s")
+        if max_rate:
+            time.sleep(max(0.0, len(chunk) / max_rate - (time.perf_counter() - chunk_start)))
+
+    try:
+        chunk = []
+        for patient in cursor:
+            chunk.append(patient)
+            if len(chunk) >= batch_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+    except BaseException:
+        checkpoint_collection.update_one({'_id': RESCORE_JOB_ID}, {'$set': {'status': 'interrupted'}})
+        raise
+    finally:
+        cursor.close()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        'processed': processed,
+        'processed_this_run': run_processed,
+        'seconds': round(elapsed, 3),
+        'docs_per_second': round(run_processed / elapsed, 1) if elapsed else None
+    }
+    checkpoint_collection.update_one(
+        {'_id': RESCORE_JOB_ID},
+        {'$set': {'status': 'completed', 'finished_at': datetime.datetime.now(), 'summary': summary}}
+    )
+    return summary
+
+# current checkpoint of the rescoring job
+def get_rescore_status():
+    checkpoint = checkpoint_collection.find_one({'_id': RESCORE_JOB_ID})
+    if not checkpoint:
+        return {'status': 'never_run'}
+    checkpoint['last_id'] = str(checkpoint['last_id'])
+    return checkpoint
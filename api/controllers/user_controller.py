@@ -2,19 +2,16 @@ import datetime
 import hashlib
 from flask import jsonify, request
 from flask_jwt_extended import create_access_token, get_jwt_identity
-from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 from bson import ObjectId
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
+from utils.db import db
+
 
 
 load_dotenv()
 
-# MongoDB connection
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client['dev-db']
+# MongoDB collections, on the shared client
 user_collection = db['users']
 
 SLACK_BOT_TOKEN = os.getenv('SLACK_BOT_TOKEN')
@@ -58,7 +55,6 @@ def profile():
     email = get_jwt_identity()
     user = user_collection.find_one({'email': email})
     if user:
-        user['_id'] = str(user['_id'])
         return user
     return {'error': 'User not found'}
 
@@ -91,6 +87,9 @@ def delete_user():
 
 
 def send_message(channel_id, message_text):
+    # imported here so routes that never message Slack do not pay for slack_sdk at cold start
+    from slack_sdk import WebClient
+    from slack_sdk.errors import SlackApiError
     slack_client = WebClient(token=SLACK_BOT_TOKEN)
     channel_id = channel_id
     message_text = message_text
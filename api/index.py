@@ -2,43 +2,61 @@ import datetime
 import traceback
 from flask import Flask, jsonify
 from flask_cors import CORS
-from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
 from flask_jwt_extended import JWTManager
+from werkzeug.exceptions import HTTPException
+
+from services.indexes import ensure_indexes
+from utils.db import on_connect
+from utils.json_provider import MongoJSONProvider
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+# serializes ObjectId, datetime and Decimal128 straight from MongoDB documents
+app.json = MongoJSONProvider(app)
 jwt = JWTManager(app)
 
-# Configure MongoDB
-client = MongoClient(os.getenv('MONGO_URI'))
-db = client['dev-db']
+# A long-running server creates the indexes the controllers rely on once its first request
+# connects to MongoDB. A serverless function would pay for it on every cold start, so on Vercel it
+# is off by default and the deploy runs `python manage.py ensure-indexes` instead.
+# ENSURE_INDEXES_ON_STARTUP=1 or 0 overrides either default.
+ENSURE_INDEXES_ON_STARTUP = os.getenv('ENSURE_INDEXES_ON_STARTUP') or ('0' if os.getenv('VERCEL') else '1')
+if ENSURE_INDEXES_ON_STARTUP != '0':
+    on_connect(ensure_indexes)
 
 # JWT Configuration
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = datetime.timedelta(days=1)
 
+# Reject oversized bodies while they stream in; leaves room for the multipart framing around a lab report
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', int(os.getenv('MAX_LAB_REPORT_BYTES', 20 * 1024 * 1024)) + 1024 * 1024))
+
 # CORS
 CORS(app)
 
 # Import blueprints (assuming these blueprints contain JWT-protected routes)
 from routes.patient_routes import patient_bp
 from routes.care_plan_routes import care_plan_bp
-from routes.diagnose_routes import diagnose_bp
+from routes.diagnose_routes import diagnose_bp, cohort_bp
 from routes.forum_routes import forum_bp
 from routes.user_routes import user_bp
 from routes.allocation_routes import allocation_bp
+from routes.model_routes import model_bp
+from routes.job_routes import job_bp
 
 app.register_blueprint(patient_bp)
 app.register_blueprint(care_plan_bp)
 app.register_blueprint(diagnose_bp)
+app.register_blueprint(cohort_bp)
 app.register_blueprint(forum_bp)
 app.register_blueprint(user_bp)
 app.register_blueprint(allocation_bp)
+app.register_blueprint(model_bp)
+app.register_blueprint(job_bp)
 
 @app.route('/')
 def home():
@@ -52,6 +70,10 @@ def error_stack(error):
     }
     return jsonify(response), 500
 
+@app.errorhandler(HTTPException)
+def handle_http_exception(e):
+    return jsonify({'error': e.description}), e.code
+
 @app.errorhandler(Exception)
 def handle_exception(e):
     return error_stack(str(e))
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def export_models(args):
+    from controllers.diagnose_controller import export_models
+    print(json.dumps(export_models(args.models), indent=2))
+
+
+def rescore(args):
+    if args.nice:
+        os.nice(args.nice)
+    from controllers.rescore_controller import rescore_patients
+    print(json.dumps(rescore_patients(batch_size=args.batch_size, max_rate=args.max_rate, restart=args.restart), indent=2))
+
+
+def backfill_criticality(args):
+    from controllers.patient_controller import backfill_criticality_scores
+    total = 0
+    while True:
+        scored = backfill_criticality_scores(limit=args.batch_size)
+        total += scored
+        if scored:
+            print(f'{total} patients scored')
+        if scored < args.batch_size:
+            break
+    print(json.dumps({'scored': total}, indent=2))
+
+
+def bench_diagnose(args):
+    from benchmarks.diagnose_bench import run
+    report = run(output=args.output, iterations=args.iterations, batch_sizes=args.batch_sizes, mongo_uri=args.mongo_uri)
+    print(json.dumps(report, indent=2))
+
+
+def bench_json(args):
+    from benchmarks.json_bench import run
+    report = run(output=args.output, iterations=args.iterations, reports=args.reports)
+    print(json.dumps(report, indent=2))
+
+
+def bench_import(args):
+    from benchmarks.import_bench import run
+    report = run(output=args.output, runs=args.runs, budget_ms=args.budget_ms)
+    print(json.dumps(report, indent=2))
+    if not report['ok']:
+        sys.exit(1)
+
+
+def migrate_lab_reports(args):
+    from controllers.lab_report_controller import migrate_lab_reports
+    print(json.dumps(migrate_lab_reports(batch_size=args.batch_size, dry_run=args.dry_run), indent=2))
+
+
+def database():
+    from utils.db import get_database
+    return get_database()
+
+
+def ensure_indexes(args):
+    from services.indexes import ensure_indexes
+    report = ensure_indexes(database())
+    print(json.dumps(report, indent=2))
+    if report['errors']:
+        sys.exit(1)
+
+
+def check_indexes(args):
+    from services.indexes import check_query_plans
+    results = check_query_plans(database())
+    print(json.dumps(results, indent=2))
+    if not all(result['ok'] for result in results):
+        sys.exit(1)
+
+
+def import_lab_reports(args):
+    from controllers.lab_import_controller import import_lab_reports
+    mapping = None
+    if args.mapping:
+        with open(args.mapping) as f:
+            mapping = json.load(f)
+    files = []
+    for path in args.paths:
+        with open(path, 'rb') as f:
+            files.append((os.path.basename(path), f.read()))
+    report = import_lab_reports(files, mapping, workers=args.workers, llm_concurrency=args.llm_concurrency)
+    if 'error' in report:
+        print(report['error'], file=sys.stderr)
+        sys.exit(1)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+    print(json.dumps(report, indent=2, default=str))
+
+
+def run_jobs(args):
+    from controllers.job_controller import run_jobs
+    # importing the controllers registers the handler of every job type
+    import controllers.patient_controller
+    import controllers.lab_import_controller
+    run_jobs(workers=args.workers, poll_seconds=args.poll_seconds, once=args.once)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Medisynth maintenance commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export-models', help='flatten the pickled random forests into compact .npz artifacts')
+    export.add_argument('models', nargs='*', help='heart, stroke or diabetes (default: all)')
+    export.set_defaults(func=export_models)
+
+    rescore_job = commands.add_parser('rescore', help='recompute predictions and criticality scores for every patient, resuming from the last checkpoint')
+    rescore_job.add_argument('--batch-size', type=int, default=500)
+    rescore_job.add_argument('--max-rate', type=float, default=None, help='upper bound on documents per second')
+    rescore_job.add_argument('--restart', action='store_true', help='ignore the checkpoint and start from the first document')
+    rescore_job.add_argument('--nice', type=int, default=10, help='scheduling niceness increment for this process')
+    rescore_job.set_defaults(func=rescore)
+
+    backfill = commands.add_parser('backfill-criticality', help='store a criticality score for every patient that has none yet (run once at deploy)')
+    backfill.add_argument('--batch-size', type=int, default=1000)
+    backfill.set_defaults(func=backfill_criticality)
+
+    bench = commands.add_parser('bench-diagnose', help='benchmark model loading and inference offline, writing the results as JSON')
+    bench.add_argument('--output', help='write the report to this JSON file')
+    bench.add_argument('--iterations', type=int, default=500, help='single-row predictions per model')
+    bench.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+    bench.add_argument('--mongo-uri', help='local MongoDB to run predict_all against (default: in-memory mongomock)')
+    bench.set_defaults(func=bench_diagnose)
+
+    bench_json_parser = commands.add_parser('bench-json', help='benchmark serializing a large patient document, writing the results as JSON')
+    bench_json_parser.add_argument('--output', help='write the report to this JSON file')
+    bench_json_parser.add_argument('--iterations', type=int, default=200)
+    bench_json_parser.add_argument('--reports', type=int, default=200, help='lab reports merged into the synthetic patient')
+    bench_json_parser.set_defaults(func=bench_json)
+
+    bench_import_parser = commands.add_parser(
+        'bench-import', help='measure the cold import of the app and fail when it is over budget or loads a heavy module eagerly'
+    )
+    bench_import_parser.add_argument('--output', help='write the report to this JSON file')
+    bench_import_parser.add_argument('--runs', type=int, default=5)
+    bench_import_parser.add_argument('--budget-ms', type=float, default=None, help='budget for the median import time (default: IMPORT_BUDGET_MS or 800)')
+    bench_import_parser.set_defaults(func=bench_import)
+
+    migrate = commands.add_parser('migrate-lab-reports', help='move lab report data embedded in patient documents into the lab_reports collection')
+    migrate.add_argument('--batch-size', type=int, default=500)
+    migrate.add_argument('--dry-run', action='store_true', help='only count the patients and reports that would be migrated')
+    migrate.set_defaults(func=migrate_lab_reports)
+
+    commands.add_parser('ensure-indexes', help='create every index in the index manifest').set_defaults(func=ensure_indexes)
+    commands.add_parser(
+        'check-indexes', help='explain the controller queries and fail if any of them is a collection scan'
+    ).set_defaults(func=check_indexes)
+
+    jobs = commands.add_parser('run-jobs', help='run background jobs queued with JOB_EXECUTION=worker (e.g. by the serverless deployment)')
+    jobs.add_argument('--workers', type=int, default=None, help='jobs run at a time (default: JOB_WORKERS or 4)')
+    jobs.add_argument('--poll-seconds', type=float, default=1.0)
+    jobs.add_argument('--once', action='store_true', help='exit once no job is waiting')
+    jobs.set_defaults(func=run_jobs)
+
+    lab_import = commands.add_parser('import-lab-reports', help='import many lab report PDFs (or ZIPs of PDFs) in one run')
+    lab_import.add_argument('paths', nargs='+', help='PDF or ZIP files; patients are taken from the file names unless --mapping is given')
+    lab_import.add_argument('--mapping', help='JSON file mapping file names to patient ids')
+    lab_import.add_argument('--workers', type=int, default=None, help='text extraction processes (default: CPU count)')
+    lab_import.add_argument('--llm-concurrency', type=int, default=None, help='concurrent LLM calls (default: 4)')
+    lab_import.add_argument('--output', help='also write the per-file report to this JSON file')
+    lab_import.set_defaults(func=import_lab_reports)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
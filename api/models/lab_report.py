@@ -1,10 +1,61 @@
+import datetime
+import uuid
+
+# formats seen in report headers, e.g. "16/5/2023 1:36:25PM" from the LPL template
+REPORT_TIME_FORMATS = [
+    "%d/%m/%Y %I:%M:%S%p",
+    "%d/%m/%Y %I:%M%p",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%d/%b/%Y %I:%M%p",
+    "%d-%b-%Y %I:%M %p",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d"
+]
+
+
+def parse_report_time(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    if not isinstance(value, str):
+        return None
+    value = " ".join(value.split())
+    for time_format in REPORT_TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, time_format)
+        except ValueError:
+            continue
+    return None
+
+
 class LabReport:
-    def __init__(self, report_id, patient_id, collected_at, reported_at, data):
+    def __init__(self, report_id, patient_id, collected_at, reported_at, data, source=None, received_at=None):
         self.report_id = report_id
         self.patient_id = patient_id
         self.collected_at = collected_at
         self.reported_at = reported_at
         self.data = data
+        self.source = source
+        self.received_at = received_at or datetime.datetime.utcnow()
+
+    # A parsed report (patient_info, vitals, lab_results, anomalies) as received for a patient.
+    # reported_at comes from the report header when it can be read, otherwise it is the time the
+    # report was received, so every report has a place in the patient's history.
+    @classmethod
+    def from_result(cls, patient_id, result, report_id=None, source=None):
+        patient_info = result.get("patient_info") or {}
+        received_at = datetime.datetime.utcnow()
+        collected_at = parse_report_time(patient_info.get("collected_at"))
+        reported_at = parse_report_time(patient_info.get("reported_at")) or collected_at or received_at
+        data = {
+            "patient_info": patient_info,
+            "vitals": result.get("vitals") or {},
+            "lab_results": result.get("lab_results") or {},
+            "anomalies": result.get("anomalies") or []
+        }
+        return cls(report_id or uuid.uuid4().hex, patient_id, collected_at, reported_at, data, source, received_at)
 
     def to_dict(self):
         return {
@@ -12,5 +63,7 @@ class LabReport:
             "patient_id": self.patient_id,
             "collected_at": self.collected_at,
             "reported_at": self.reported_at,
-            "data": self.data
+            "data": self.data,
+            "source": self.source,
+            "received_at": self.received_at
         }
@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
-from controllers.diagnose_controller import predict_heart, heart_missing_columns, predict_diabetes, diabetes_missing_columns, predict_stroke, stroke_missing_columns, get_all_missing_columns, predict_all
+from controllers.diagnose_controller import predict_heart, heart_missing_columns, predict_diabetes, diabetes_missing_columns, predict_stroke, stroke_missing_columns, get_all_missing_columns, predict_all, predict_batch, get_cohort_missing_columns
 
 diagnose_bp = Blueprint('diagnose', __name__, url_prefix='/patients/<patient_id>')
+cohort_bp = Blueprint('cohort', __name__, url_prefix='/patients')
 
 @diagnose_bp.route('/predict_heart', methods=['POST'])
 def predictions(patient_id):
@@ -33,4 +34,15 @@ def all_missing(patient_id):
 
 @diagnose_bp.route('/predict_all', methods=['POST'])
 def all_predictions(patient_id):
-    return jsonify(predict_all(patient_id))
\ No newline at end of file
+    return jsonify(predict_all(patient_id))
+
+@cohort_bp.route('/predict_batch', methods=['POST'])
+def batch_predictions():
+    return jsonify(predict_batch(request.json))
+
+@cohort_bp.route('/missing_columns', methods=['GET'])
+def cohort_missing():
+    data = request.args.to_dict()
+    if data.get('patient_ids'):
+        data['patient_ids'] = data['patient_ids'].split(',')
+    return jsonify(get_cohort_missing_columns(data))
\ No newline at end of file
@@ -0,0 +1,10 @@
+from flask import Blueprint, request, jsonify
+from controllers.job_controller import get_job
+
+job_bp = Blueprint('job', __name__, url_prefix='/jobs')
+
+# ?wait=<seconds> long-polls until the job finishes
+@job_bp.route('/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    wait = request.args.get('wait', default=0, type=float)
+    return jsonify(get_job(job_id, wait))
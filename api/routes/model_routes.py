@@ -0,0 +1,30 @@
+from flask import Blueprint, request, jsonify
+from controllers.diagnose_controller import get_model_info, reload_models, get_prediction_cache_stats, get_model_server_stats
+from controllers.rescore_controller import get_rescore_status
+from services.model_registry import UnknownModel
+
+model_bp = Blueprint('models', __name__, url_prefix='/models')
+
+@model_bp.route('', methods=['GET'])
+def model_info():
+    return jsonify(get_model_info())
+
+@model_bp.route('/reload', methods=['POST'])
+def reload():
+    name = (request.get_json(silent=True) or {}).get('name')
+    try:
+        return jsonify(reload_models(name))
+    except UnknownModel as e:
+        return jsonify({'error': e.args[0]}), 404
+
+@model_bp.route('/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(get_prediction_cache_stats())
+
+@model_bp.route('/rescore', methods=['GET'])
+def rescore_status():
+    return jsonify(get_rescore_status())
+
+@model_bp.route('/serving', methods=['GET'])
+def serving_stats():
+    return jsonify(get_model_server_stats())
@@ -1,8 +1,24 @@
-from flask import Blueprint, request, jsonify
-from controllers.patient_controller import get_patient_details, get_lab_reports, upload_lab_report, manual_input, get_criticality_score, get_all_patients, get_patients_assigned_to_staff, remove_patient
+import datetime
+import json
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context, url_for
+from controllers.patient_controller import get_patient_details, get_lab_reports, upload_lab_report, manual_input, get_criticality_score, get_all_patients, get_patients_assigned_to_staff, remove_patient, get_lab_report_cache_stats, submit_lab_report_job, get_triage, get_patient_trends
+from controllers.job_controller import JobQueueFull
+from controllers.lab_report_controller import get_lab_report_history
+from controllers.lab_import_controller import MAX_LAB_IMPORT_BYTES, import_lab_reports, submit_lab_import_job
+from services.pdf_ingest import read_upload
 
 patient_bp = Blueprint('patient', __name__, url_prefix='/patients')
 
+# an integer query parameter; a value that is not one raises ValueError instead of being ignored
+def int_arg(name, default=None):
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+
 @patient_bp.route('/<patient_id>', methods=['GET'])
 def get_patient(patient_id):
     return jsonify(get_patient_details(patient_id))
@@ -11,6 +27,38 @@ def get_patient(patient_id):
 def get_patient_lab_reports(patient_id):
     return jsonify(get_lab_reports(patient_id))
 
+# ?cursor=<next_cursor>&limit=<n>: the patient's reports, newest first; next_cursor pages back
+@patient_bp.route('/<patient_id>/lab_reports/history', methods=['GET'])
+def get_patient_lab_report_history(patient_id):
+    try:
+        limit = int_arg('limit', 20)
+        if limit < 1 or limit > 100:
+            return jsonify({'error': 'limit must be between 1 and 100'}), 400
+        return jsonify(get_lab_report_history(patient_id, request.args.get('cursor') or None, limit))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+# ?metrics=a,b&window=raw|day|week&max_points=<n>&since=<ISO>&until=<ISO>: per-metric series across
+# the patient's lab reports, as columns of t (epoch ms), min, max, mean and count
+@patient_bp.route('/<patient_id>/trends', methods=['GET'])
+def get_patient_trends_route(patient_id):
+    metrics = request.args.get('metrics')
+    try:
+        since, until = [
+            datetime.datetime.fromisoformat(request.args[name]) if request.args.get(name) else None
+            for name in ('since', 'until')
+        ]
+        return jsonify(get_patient_trends(
+            patient_id,
+            metrics.split(',') if metrics else None,
+            request.args.get('window', 'raw'),
+            int_arg('max_points', 200),
+            since,
+            until
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @patient_bp.route('/<patient_id>/upload_lab_report', methods=['POST'])
 def upload_patient_lab_report(patient_id):
     if 'file' not in request.files:
@@ -18,7 +66,43 @@ def upload_patient_lab_report(patient_id):
     file = request.files['file']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
-    return jsonify(upload_lab_report(patient_id, file))
+    # ?sync=1 keeps the request open until the report is merged
+    if request.args.get('sync') == '1':
+        return jsonify(upload_lab_report(patient_id, file))
+    try:
+        job = submit_lab_report_job(patient_id, file)
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    job['status_url'] = url_for('job.get_job_status', job_id=job['job_id'])
+    return jsonify(job), 202
+
+# many PDFs and/or ZIPs of PDFs in the 'files' field; 'mapping' optionally maps file names to
+# patient ids (the file name without extension is used otherwise)
+@patient_bp.route('/import_lab_reports', methods=['POST'])
+def import_patient_lab_reports():
+    request.max_content_length = MAX_LAB_IMPORT_BYTES
+    uploads = request.files.getlist('files')
+    if not uploads:
+        return jsonify({'error': 'No files part'}), 400
+    try:
+        mapping = json.loads(request.form.get('mapping') or '{}')
+    except json.JSONDecodeError:
+        mapping = None
+    if not isinstance(mapping, dict):
+        return jsonify({'error': 'mapping must be a JSON object'}), 400
+    files = [(upload.filename, read_upload(upload, MAX_LAB_IMPORT_BYTES)) for upload in uploads]
+    if request.args.get('sync') == '1':
+        return jsonify(import_lab_reports(files, mapping))
+    try:
+        job = submit_lab_import_job(files, mapping)
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    job['status_url'] = url_for('job.get_job_status', job_id=job['job_id'])
+    return jsonify(job), 202
+
+@patient_bp.route('/lab_report_cache/stats', methods=['GET'])
+def lab_report_cache_stats():
+    return jsonify(get_lab_report_cache_stats())
 
 @patient_bp.route('/<patient_id>/manual_input', methods=['POST'])
 def manual_input_patient(patient_id):
@@ -29,13 +113,52 @@ def manual_input_patient(patient_id):
 def get_criticality(patient_id):
     return jsonify(get_criticality_score(patient_id))
 
+# ?k=<n>&staff_id=<id>&ward=<ward>: the k most critical patients; live=1 rescores instead of
+# reading the stored scores
+@patient_bp.route('/triage', methods=['GET'])
+def triage():
+    try:
+        k = int_arg('k', 10)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if k < 1 or k > 1000:
+        return jsonify({'error': 'k must be between 1 and 1000'}), 400
+    live = request.args.get('live') == '1'
+    return jsonify(get_triage(k, request.args.get('staff_id'), request.args.get('ward'), live))
+
+# ?fields=a,b.c&after=<patient_id>&limit=<n>: a JSON array streamed as the cursor yields the
+# documents; the patient_id to pass as after for the next page is in X-Next-Cursor. Without
+# limit every matching patient is returned.
+def stream_patients(find, *args):
+    try:
+        fields = request.args.get('fields')
+        patients, next_cursor = find(
+            *args,
+            fields=fields.split(',') if fields else None,
+            after=request.args.get('after'),
+            limit=int_arg('limit')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        yield '['
+        for i, patient in enumerate(patients):
+            yield (',' if i else '') + current_app.json.dumps(patient)
+        yield ']'
+
+    response = Response(stream_with_context(generate()), mimetype='application/json')
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
 @patient_bp.route('/all', methods=['GET'])
 def get_all():
-    return jsonify(get_all_patients())
+    return stream_patients(get_all_patients)
 
 @patient_bp.route('/staff/<staff_id>', methods=['GET'])
 def get_assigned(staff_id):
-    return jsonify(get_patients_assigned_to_staff(staff_id))
+    return stream_patients(get_patients_assigned_to_staff, staff_id)
 
 @patient_bp.route('/<patient_id>', methods=['DELETE'])
 def delete_patient(patient_id):
@@ -0,0 +1,157 @@
+import datetime
+import hashlib
+import math
+import numbers
+
+import numpy as np
+
+# Same weights, defaults and normalizations as calculate_criticality_score, evaluated for many
+# patients at once. Inputs are gathered into one float64 array per field and every expression is
+# written in the scalar function's operation order, so the scores are bit-for-bit identical. A
+# patient whose inputs the scalar function could not score (a non-numeric value) gets NaN.
+CRITICALITY_WEIGHTS = {'VS': 20, 'LR': 15, 'MH': 10, 'S': 15, 'RF': 10, 'DT': 15, 'FS': 5, 'MU': 10}
+
+CHEST_PAIN_SCORES = {'ATA': 25, 'NAP': 50, 'ASY': 75, 'TA': 100}
+RESTING_ECG_SCORES = {'Normal': 0, 'Abnormal': 100}
+ST_SLOPE_SCORES = {'Up': 0, 'Flat': 50, 'Down': 100}
+
+# every field the score reads, for projections
+CRITICALITY_FIELDS = ['manual_data', 'lab_results', 'vitals', 'anomalies', 'patient_info']
+
+
+def number(value):
+    # exact type check first: isinstance against the numbers ABC is slow on this hot path
+    if value.__class__ is float or value.__class__ is int:
+        return value
+    if isinstance(value, numbers.Real):
+        return float(value)
+    return np.nan
+
+def mapped(value, mapping):
+    try:
+        return mapping.get(value, 0)
+    except TypeError:
+        return np.nan
+
+def anomaly_result(anomalies, test_name, default):
+    try:
+        return next((item['result'] for item in anomalies if item['test_name'] == test_name), default)
+    except (TypeError, KeyError):
+        return np.nan
+
+def normalize_lab(values, min_val, max_val):
+    if min_val == max_val:
+        return np.zeros_like(values)
+    return (values - min_val) / (max_val - min_val) * 10
+
+INPUT_FIELDS = (
+    'bp', 'hr', 'angina', 'hemoglobin', 'platelets', 'tlc', 'rdw', 'mpv',
+    'cholesterol', 'chest_pain', 'oldpeak', 'age', 'resting_ecg', 'st_slope'
+)
+
+def patient_inputs(patient_data):
+    try:
+        manual_data = patient_data.get('manual_data', {})
+        lab_results = patient_data.get('lab_results', {})
+        vitals = patient_data.get('vitals', {})
+        anomalies = patient_data.get('anomalies', [])
+        patient_info = patient_data.get('patient_info', {})
+        return (
+            number(manual_data.get('RestingBP', 120)),
+            number(manual_data.get('MaxHR', 100)),
+            10 if manual_data.get('ExerciseAngina', 'N') == 'Y' else 0,
+            number(lab_results.get('Hemoglobin', 15)),
+            number(lab_results.get('Platelet Count', 200)),
+            number(lab_results.get('Total Leukocyte Count  (TLC)', 8)),
+            number(anomaly_result(anomalies, 'Red Cell Distribution Width (RDW)', 12)),
+            number(anomaly_result(anomalies, 'Mean Platelet Volume', 10)),
+            number(manual_data.get('Cholesterol', 200)),
+            mapped(vitals.get('ChestPainType', 'ATA'), CHEST_PAIN_SCORES),
+            number(manual_data.get('Oldpeak', 0)),
+            number(patient_info.get('age', 50)),
+            mapped(manual_data.get('RestingECG', 'Normal'), RESTING_ECG_SCORES),
+            mapped(manual_data.get('ST_Slope', 'Up'), ST_SLOPE_SCORES)
+        )
+    except AttributeError:
+        # a section that is not a document, e.g. manual_data: null
+        return (np.nan,) * len(INPUT_FIELDS)
+
+# {field: float64 array} of the score inputs of each patient document
+def criticality_inputs(patients):
+    rows = np.array([patient_inputs(patient_data) for patient_data in patients], dtype=np.float64).reshape(-1, len(INPUT_FIELDS))
+    return {name: rows[:, i] for i, name in enumerate(INPUT_FIELDS)}
+
+def criticality_scores_from_inputs(inputs):
+    weights = CRITICALITY_WEIGHTS
+
+    # Vital Signs (VS)
+    vs_score = (
+        (inputs['bp'] - 90) / (180 - 90) * 10 * 0.33 +
+        (inputs['hr'] - 60) / (200 - 60) * 10 * 0.33 +
+        inputs['angina'] * 0.33
+    )
+
+    # Lab Results (LR)
+    lr_score = (
+        normalize_lab(inputs['hemoglobin'], 12, 18) * 0.2 +
+        normalize_lab(inputs['platelets'], 150, 450) * 0.2 +
+        normalize_lab(inputs['tlc'], 4, 11) * 0.2 +
+        normalize_lab(inputs['rdw'], 11.60, 14.00) * 0.2 +
+        normalize_lab(inputs['mpv'], 6.5, 12.0) * 0.2
+    )
+
+    # Medical History (MH)
+    mh_score = normalize_lab(inputs['cholesterol'], 150, 300) * 0.5 + 0
+
+    # Symptoms (S)
+    s_score = inputs['chest_pain'] * 0.5 + normalize_lab(inputs['oldpeak'], 0, 6) * 0.5
+
+    # Risk Factors (RF)
+    rf_score = (inputs['age'] - 20) / (80 - 20) * 10 * 0.5 + 50
+
+    # Diagnostic Tests (DT)
+    dt_score = inputs['resting_ecg'] * 0.5 + inputs['st_slope'] * 0.5
+
+    weighted_sum = (
+        (weights['VS'] * vs_score) +
+        (weights['LR'] * lr_score) +
+        (weights['MH'] * mh_score) +
+        (weights['S'] * s_score) +
+        (weights['RF'] * rf_score) +
+        (weights['DT'] * dt_score) +
+        (weights['FS'] * 0) +
+        (weights['MU'] * 0)
+    )
+    return weighted_sum / sum(weights.values())
+
+# criticality score of every patient document, as a float64 array
+def criticality_scores(patients):
+    return criticality_scores_from_inputs(criticality_inputs(patients))
+
+# hash of exactly the values the score is computed from
+def criticality_fingerprint(patient_data):
+    return hashlib.sha256(repr(patient_inputs(patient_data)).encode('utf-8')).hexdigest()
+
+# Filter matching a patient document only while the fields the score reads still hold the values
+# of patient_data. A score computed from a snapshot is written with it, so a writer holding an
+# older snapshot than the document never replaces the score of a newer one.
+def unchanged_inputs_filter(patient_data):
+    return {
+        field: patient_data[field] if field in patient_data else {'$exists': False}
+        for field in CRITICALITY_FIELDS
+    }
+
+# fields stored with a computed score; an unscorable patient is stored as null
+def criticality_fields(patient_data, score, fingerprint=None):
+    return {
+        'criticality_score': None if math.isnan(score) else float(score),
+        'criticality_updated_at': datetime.datetime.utcnow(),
+        'criticality_fingerprint': fingerprint or criticality_fingerprint(patient_data)
+    }
+
+# indexes of the k highest scores, highest first; NaN scores are never selected
+def top_k(scores, k):
+    candidates = np.flatnonzero(~np.isnan(scores))
+    if k < len(candidates):
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
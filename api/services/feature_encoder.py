@@ -0,0 +1,197 @@
+import math
+
+import numpy as np
+
+
+# numpy scalars to plain python values so the encoder can be stored as JSON
+def _native(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# Numerical block: impute missing values, then standardize
+class NumericBlock:
+    def __init__(self, columns, fill_values, mean, scale):
+        self.columns = list(columns)
+        self.fill_values = np.asarray(fill_values, dtype=np.float64)
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+        self.width = len(self.columns)
+
+    def fill(self, out, rows):
+        for i, row in enumerate(rows):
+            for j, column in enumerate(self.columns):
+                value = row.get(column, 0)
+                out[i, j] = np.nan if value is None else value
+        missing = np.isnan(out)
+        if missing.any():
+            out[missing] = np.broadcast_to(self.fill_values, out.shape)[missing]
+        if self.mean is not None:
+            out -= self.mean
+        if self.scale is not None:
+            out /= self.scale
+
+    def to_dict(self):
+        return {
+            'type': 'numeric',
+            'columns': self.columns,
+            'fill_values': self.fill_values.tolist(),
+            'mean': None if self.mean is None else self.mean.tolist(),
+            'scale': None if self.scale is None else self.scale.tolist()
+        }
+
+
+# Categorical block: impute missing values (None or NaN), then one-hot encode (unknown values encode as all zeros)
+class OneHotBlock:
+    def __init__(self, columns, fill_values, categories, handle_unknown='ignore'):
+        self.columns = list(columns)
+        self.fill_values = list(fill_values)
+        self.categories = [list(c) for c in categories]
+        self.handle_unknown = handle_unknown
+        self.offsets = []
+        self.lookups = []
+        offset = 0
+        for values in self.categories:
+            self.offsets.append(offset)
+            self.lookups.append({value: index for index, value in enumerate(values)})
+            offset += len(values)
+        self.width = offset
+
+    def fill(self, out, rows):
+        out[:] = 0
+        for i, row in enumerate(rows):
+            for j, column in enumerate(self.columns):
+                value = row.get(column, 0)
+                # None is a missing value, like NaN
+                if value is None or isinstance(value, float) and math.isnan(value):
+                    value = self.fill_values[j]
+                try:
+                    index = self.lookups[j].get(value)
+                except TypeError:
+                    index = None
+                if index is not None:
+                    out[i, self.offsets[j] + index] = 1
+                elif self.handle_unknown == 'error':
+                    raise ValueError(f"Found unknown category {value!r} in column {column}")
+
+    def to_dict(self):
+        return {
+            'type': 'onehot',
+            'columns': self.columns,
+            'fill_values': [_native(value) for value in self.fill_values],
+            'categories': [[_native(value) for value in values] for values in self.categories],
+            'handle_unknown': self.handle_unknown
+        }
+
+
+# Compiled equivalent of a fitted ColumnTransformer made of imputer/scaler and imputer/one-hot
+# pipelines. Encodes patient dicts straight into a preallocated array in the column order the
+# classifier was trained on, without building a DataFrame per request.
+class FeatureEncoder:
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.n_features = sum(block.width for block in blocks)
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        # sklearn is only needed to compile; a compiled encoder is plain numpy
+        from sklearn.compose import ColumnTransformer
+        from sklearn.pipeline import Pipeline
+
+        if not isinstance(pipeline, Pipeline) or not isinstance(pipeline.steps[0][1], ColumnTransformer):
+            raise ValueError('Expected a Pipeline starting with a ColumnTransformer')
+        preprocessor = pipeline.steps[0][1]
+        if len(pipeline.steps) != 2:
+            raise ValueError('Expected a preprocessor followed by a single estimator')
+
+        blocks = []
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            if isinstance(transformer, str) or not isinstance(transformer, Pipeline):
+                raise ValueError(f"Unsupported transformer: {name}")
+            steps = [step for _, step in transformer.steps]
+            blocks.append(cls._compile_block(name, steps, columns))
+
+        encoder = cls(blocks)
+        if encoder.n_features != pipeline.steps[-1][1].n_features_in_:
+            raise ValueError('Encoded width does not match the estimator')
+        return encoder
+
+    @staticmethod
+    def _compile_block(name, steps, columns):
+        from sklearn.impute import SimpleImputer
+        from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+        if len(steps) != 2 or not isinstance(steps[0], SimpleImputer) or steps[0].add_indicator:
+            raise ValueError(f"Unsupported transformer: {name}")
+        imputer, second = steps
+        # the blocks impute None and NaN; any other missing_values marker is left to sklearn
+        if not (isinstance(imputer.missing_values, float) and math.isnan(imputer.missing_values)):
+            raise ValueError(f"Unsupported imputer missing_values: {name}")
+
+        if isinstance(second, StandardScaler):
+            # mean_ is fitted even with with_mean=False, but only a centering scaler subtracts it
+            return NumericBlock(
+                columns,
+                imputer.statistics_,
+                second.mean_ if second.with_mean else None,
+                second.scale_ if second.with_std else None
+            )
+
+        if isinstance(second, OneHotEncoder):
+            if second.drop_idx_ is not None or getattr(second, 'max_categories', None) or getattr(second, 'min_frequency', None):
+                raise ValueError(f"Unsupported one-hot options: {name}")
+            return OneHotBlock(columns, imputer.statistics_, second.categories_, second.handle_unknown)
+
+        raise ValueError(f"Unsupported transformer: {name}")
+
+    # encode many patient dicts into one (n_rows, n_features) matrix
+    def encode(self, rows):
+        out = np.empty((len(rows), self.n_features), dtype=np.float64)
+        start = 0
+        for block in self.blocks:
+            block.fill(out[:, start:start + block.width], rows)
+            start += block.width
+        return out
+
+    def encode_one(self, row):
+        return self.encode([row])
+
+    def to_dict(self):
+        return {'blocks': [block.to_dict() for block in self.blocks]}
+
+    @classmethod
+    def from_dict(cls, data):
+        blocks = []
+        for block in data['blocks']:
+            if block['type'] == 'numeric':
+                blocks.append(NumericBlock(block['columns'], block['fill_values'], block['mean'], block['scale']))
+            elif block['type'] == 'onehot':
+                blocks.append(OneHotBlock(block['columns'], block['fill_values'], block['categories'], block['handle_unknown']))
+            else:
+                raise ValueError(f"Unknown encoder block: {block['type']}")
+        return cls(blocks)
+
+
+# A fitted pipeline served through its compiled encoder and final estimator. Pipelines the
+# encoder does not understand fall back to the DataFrame path.
+class EncodedModel:
+    def __init__(self, pipeline, columns):
+        self.pipeline = pipeline
+        self.columns = list(columns)
+        self.classes_ = pipeline.classes_
+        try:
+            self.encoder = FeatureEncoder.from_pipeline(pipeline)
+            self.estimator = pipeline.steps[-1][1]
+        except ValueError:
+            self.encoder = None
+            self.estimator = None
+
+    def predict_proba_rows(self, rows):
+        if self.encoder is not None:
+            return self.estimator.predict_proba(self.encoder.encode(rows))
+        import pandas as pd
+        features = pd.DataFrame(rows).reindex(columns=self.columns, fill_value=0)
+        # None is a missing value, as it is for the encoder; the imputers only recognise NaN
+        features = features.where(features.notna(), np.nan)
+        return self.pipeline.predict_proba(features)
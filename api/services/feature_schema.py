@@ -0,0 +1,77 @@
+# Compiled check of which model inputs a patient is missing.
+#
+# schemas maps model name -> {column: 'numerical' | [allowed values]}; derived maps model name ->
+# {column: rule} for inputs computed from other fields before the check:
+#   ('default', source, value)           source, or value when source is absent
+#   ('map', source, matches, yes, no)    yes when source (absent counts as the first match) is in
+#                                        matches, otherwise no
+# A column is missing when it is absent or None, or when it is categorical and its value is not
+# one of the allowed values. The same rules compile to a MongoDB aggregation for cohorts.
+class FeatureValidator:
+    def __init__(self, schemas, derived=None):
+        derived = derived or {}
+        self.models = []
+        for model_name, columns in schemas.items():
+            checks = []
+            for column, spec in columns.items():
+                allowed = list(spec) if isinstance(spec, list) else None
+                checks.append((column, spec, allowed, derived.get(model_name, {}).get(column)))
+            self.models.append((model_name, checks))
+
+    @staticmethod
+    def _value(patient_data, column, rule):
+        if rule is None:
+            return patient_data.get(column)
+        if rule[0] == 'default':
+            return patient_data.get(rule[1], rule[2])
+        if rule[0] == 'map':
+            _, source, matches, yes, no = rule
+            return yes if patient_data.get(source, matches[0]) in matches else no
+        raise ValueError(f"Unknown rule: {rule[0]}")
+
+    # {model: {column: spec}} of the inputs each model is missing
+    def missing(self, patient_data):
+        result = {}
+        for model_name, checks in self.models:
+            missing_columns = {}
+            for column, spec, allowed, rule in checks:
+                value = self._value(patient_data, column, rule)
+                if value is None or (allowed is not None and value not in allowed):
+                    missing_columns[column] = spec
+            result[model_name] = missing_columns
+        return result
+
+    # all missing inputs merged into one {column: spec} dict
+    def missing_columns(self, patient_data):
+        merged = {}
+        for missing_columns in self.missing(patient_data).values():
+            merged.update(missing_columns)
+        return merged
+
+    @staticmethod
+    def _expression(data, column, rule):
+        if rule is None:
+            return f'{data}.{column}'
+        if rule[0] == 'default':
+            source = f'{data}.{rule[1]}'
+            return {'$cond': [{'$eq': [{'$type': source}, 'missing']}, rule[2], source]}
+        if rule[0] == 'map':
+            _, source, matches, yes, no = rule
+            source = f'{data}.{source}'
+            value = {'$cond': [{'$eq': [{'$type': source}, 'missing']}, matches[0], source]}
+            return {'$cond': [{'$in': [value, list(matches)]}, yes, no]}
+        raise ValueError(f"Unknown rule: {rule[0]}")
+
+    # aggregation stages turning a {data: merged patient fields} document into {missing: {model: [columns]}}
+    def missing_stage(self, data='$data'):
+        missing = {}
+        for model_name, checks in self.models:
+            columns = []
+            for column, spec, allowed, rule in checks:
+                value = self._expression(data, column, rule)
+                condition = {'$eq': [{'$ifNull': [value, None]}, None]}
+                if allowed is not None:
+                    condition = {'$or': [condition, {'$not': [{'$in': [value, allowed]}]}]}
+                columns.append({'$cond': [condition, column, None]})
+            missing[model_name] = {'$filter': {'input': columns, 'cond': {'$ne': ['$$this', None]}}}
+        return {'$project': {'_id': 0, 'patient_id': 1, 'missing': missing}}
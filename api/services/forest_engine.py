@@ -0,0 +1,170 @@
+import json
+
+import numpy as np
+
+from services.feature_encoder import FeatureEncoder
+
+# bump whenever the layout of the exported arrays changes
+FORMAT_VERSION = 1
+
+
+# A fitted random forest flattened into contiguous arrays.
+# Internal nodes are stored in feature/threshold/left/right; a child reference >= 0 points at
+# another internal node and a negative one (-slot - 1) at a row of leaf_values, which holds the
+# already normalized class probabilities of that leaf. Traversal runs over every row and tree at
+# once, one tree level per step, touching only the pairs that have not reached a leaf yet.
+class CompactForest:
+    def __init__(self, feature, threshold, left, right, roots, leaf_values, max_depth, classes):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.leaf_values = np.ascontiguousarray(leaf_values, dtype=np.float64)
+        self.max_depth = int(max_depth)
+        self.classes_ = np.asarray(classes)
+
+    @classmethod
+    def from_estimator(cls, forest):
+        estimators = getattr(forest, 'estimators_', None)
+        if not estimators or getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError('Expected a fitted single-output forest classifier')
+
+        features, thresholds, lefts, rights, roots, leaf_values = [], [], [], [], [], []
+        internal_offset = 0
+        leaf_offset = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            internal_ids = np.flatnonzero(~is_leaf)
+            leaf_ids = np.flatnonzero(is_leaf)
+
+            code = np.empty(tree.node_count, dtype=np.int64)
+            code[internal_ids] = internal_offset + np.arange(len(internal_ids))
+            code[leaf_ids] = -(leaf_offset + np.arange(len(leaf_ids))) - 1
+
+            features.append(tree.feature[internal_ids])
+            thresholds.append(tree.threshold[internal_ids])
+            lefts.append(code[tree.children_left[internal_ids]])
+            rights.append(code[tree.children_right[internal_ids]])
+            roots.append(code[0])
+
+            # same normalization DecisionTreeClassifier.predict_proba applies to the leaf it reaches
+            proba = tree.value[leaf_ids, 0, :forest.n_classes_].copy()
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba /= normalizer
+            leaf_values.append(proba)
+
+            internal_offset += len(internal_ids)
+            leaf_offset += len(leaf_ids)
+
+        return cls(
+            np.concatenate(features),
+            np.concatenate(thresholds),
+            np.concatenate(lefts),
+            np.concatenate(rights),
+            np.asarray(roots),
+            np.concatenate(leaf_values),
+            max(estimator.tree_.max_depth for estimator in estimators),
+            forest.classes_
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.roots, self.leaf_values))
+
+    # leaf slot reached in every tree, shape (n_rows, n_trees)
+    def apply(self, X):
+        # sklearn compares float32 inputs against float64 thresholds; do the same
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        nodes = np.repeat(self.roots[np.newaxis, :], n_rows, axis=0).ravel()
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, self.n_trees)
+
+        # only (row, tree) pairs still sitting on an internal node move down a level
+        active = np.flatnonzero(nodes >= 0)
+        while active.size:
+            current = nodes[active]
+            go_left = flat_X[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            following = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = following
+            active = active[following >= 0]
+        return (-nodes - 1).reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X):
+        leaves = np.ascontiguousarray(self.apply(X).T)
+        proba = np.zeros((leaves.shape[1], self.leaf_values.shape[1]), dtype=np.float64)
+        # accumulate tree by tree, in estimator order, exactly as RandomForestClassifier does
+        for tree_leaves in leaves:
+            proba += self.leaf_values[tree_leaves]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+# Encoder plus compact forest: everything needed to serve a model without sklearn objects
+class CompactModel:
+    def __init__(self, encoder, forest, metadata=None):
+        self.encoder = encoder
+        self.forest = forest
+        self.metadata = metadata or {}
+        self.classes_ = forest.classes_
+
+    @property
+    def nbytes(self):
+        return self.forest.nbytes
+
+    def predict_proba_rows(self, rows):
+        return self.forest.predict_proba(self.encoder.encode(rows))
+
+
+# flatten a fitted preprocessing + forest pipeline and write it as a versioned .npz file
+def export_pipeline(pipeline, path, source_sha256=None):
+    encoder = FeatureEncoder.from_pipeline(pipeline)
+    forest = CompactForest.from_estimator(pipeline.steps[-1][1])
+    metadata = {
+        'format_version': FORMAT_VERSION,
+        'classes': [c.item() if isinstance(c, np.generic) else c for c in forest.classes_],
+        'max_depth': forest.max_depth,
+        'n_trees': forest.n_trees,
+        'encoder': encoder.to_dict(),
+        'source_sha256': source_sha256
+    }
+    with open(path, 'wb') as f:
+        np.savez(
+            f,
+            metadata=np.array(json.dumps(metadata)),
+            feature=forest.feature,
+            threshold=forest.threshold,
+            left=forest.left,
+            right=forest.right,
+            roots=forest.roots,
+            leaf_values=forest.leaf_values
+        )
+    return CompactModel(encoder, forest, metadata)
+
+
+def load_compact_model(path):
+    with np.load(path, allow_pickle=False) as data:
+        metadata = json.loads(str(data['metadata']))
+        if metadata.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported model format version {metadata.get('format_version')} in {path}")
+        forest = CompactForest(
+            data['feature'],
+            data['threshold'],
+            data['left'],
+            data['right'],
+            data['roots'],
+            data['leaf_values'],
+            metadata['max_depth'],
+            metadata['classes']
+        )
+    return CompactModel(FeatureEncoder.from_dict(metadata['encoder']), forest, metadata)
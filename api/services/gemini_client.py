@@ -0,0 +1,20 @@
+import os
+import threading
+
+# google.generativeai is the slowest import of the app (it pulls in grpc, and IPython when that is
+# installed), so it is imported and configured the first time a model is actually needed rather
+# than when a controller module is loaded. Models are created once per name and shared.
+models = {}
+models_lock = threading.Lock()
+
+
+def generative_model(model_name):
+    model = models.get(model_name)
+    if model is None:
+        with models_lock:
+            model = models.get(model_name)
+            if model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+                model = models[model_name] = genai.GenerativeModel(model_name=model_name)
+    return model
@@ -1,8 +1,6 @@
-import google.generativeai as genai
-import os
 import json
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from services.gemini_client import generative_model
 
 def extract_patient_info_and_anomalies(text):
     prompt = (
@@ -33,7 +31,7 @@ def extract_patient_info_and_anomalies(text):
         f"{text}"
     )
     
-    model = genai.GenerativeModel(model_name="models/gemini-1.5-flash")
+    model = generative_model("models/gemini-1.5-flash")
     response = model.generate_content([prompt])
     
     response_text = response.candidates[0].content.parts[0].text.strip()
@@ -0,0 +1,127 @@
+import datetime
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+# Every index the controllers rely on, by collection. This manifest is their only source: request
+# paths never create indexes, `manage.py ensure-indexes` does (and a long-running server on its
+# first connection, see index.py). ensure_indexes is idempotent; an index that already exists
+# with the same keys and options is left alone.
+INDEX_MANIFEST = {
+    'patients': [
+        {'keys': [('patient_id', ASCENDING)], 'unique': True},
+        {'keys': [('staffs_assigned', ASCENDING), ('patient_id', ASCENDING)]},
+        {'keys': [('ward', ASCENDING), ('patient_id', ASCENDING)]},
+        {'keys': [('criticality_score', DESCENDING)]}
+    ],
+    'users': [
+        {'keys': [('email', ASCENDING)], 'unique': True},
+        {'keys': [('staff_id', ASCENDING)]},
+        {'keys': [('user_id', ASCENDING)]}
+    ],
+    'resources': [
+        {'keys': [('resource_id', ASCENDING)], 'unique': True}
+    ],
+    'careplans': [
+        {'keys': [('patient_id', ASCENDING)]}
+    ],
+    # search_post matches a case-insensitive substring, which no index can seek to: it scans every
+    # title key (see KNOWN_FULL_SCANS), reading only the posts that match instead of every post
+    'forum': [
+        {'keys': [('title', ASCENDING)]}
+    ],
+    # one active job per (type, dedupe_key): duplicate submissions collapse onto it
+    'jobs': [
+        {'keys': [('type', ASCENDING), ('dedupe_key', ASCENDING)], 'unique': True, 'partialFilterExpression': {'active': True}},
+        {'keys': [('patient_id', ASCENDING), ('created_at', DESCENDING)]},
+        {'keys': [('active', ASCENDING), ('owner', ASCENDING), ('created_at', ASCENDING)]}
+    ],
+    'job_payloads': [
+        {'keys': [('job_id', ASCENDING), ('file', ASCENDING), ('seq', ASCENDING)]}
+    ],
+    'lab_reports': [
+        {'keys': [('patient_id', ASCENDING), ('reported_at', ASCENDING), ('_id', ASCENDING)]},
+        {'keys': [('patient_id', ASCENDING), ('report_id', ASCENDING)], 'unique': True}
+    ],
+    'lab_report_cache': [
+        {'keys': [('text_sha256', ASCENDING), ('extractor', ASCENDING)], 'unique': True},
+        {'keys': [('pdf_sha256', ASCENDING), ('extractor', ASCENDING)]},
+        {'keys': [('expires_at', ASCENDING)], 'expireAfterSeconds': 0}
+    ]
+}
+
+# (collection, filter, sort) of the lookups the controllers run, for check_query_plans
+CONTROLLER_QUERIES = [
+    ('patients', {'patient_id': 'P0001'}, None),
+    ('patients', {'patient_id': 'P0001', '$or': [{'latest_reported_at': {'$lte': datetime.datetime(2024, 1, 1)}}, {'latest_reported_at': {'$exists': False}}]}, None),
+    ('patients', {'staffs_assigned': 'S0001'}, [('patient_id', ASCENDING)]),
+    ('patients', {'ward': 'W1'}, [('patient_id', ASCENDING)]),
+    ('patients', {'patient_id': {'$gt': 'P0001'}}, [('patient_id', ASCENDING)]),
+    ('patients', {'criticality_score': {'$type': 'number'}}, [('criticality_score', DESCENDING)]),
+    ('patients', {'criticality_score': {'$exists': False}}, None),
+    ('users', {'email': 'user@example.com'}, None),
+    ('users', {'staff_id': 'S0001'}, None),
+    ('users', {'user_id': 'S0001'}, None),
+    ('resources', {'resource_id': 'R0001'}, None),
+    ('careplans', {'patient_id': 'P0001'}, None),
+    ('jobs', {'type': 'lab_report', 'dedupe_key': 'P0001:0', 'active': True}, None),
+    ('jobs', {'active': True, 'owner': None, 'status': 'queued'}, [('created_at', ASCENDING)]),
+    ('job_payloads', {'job_id': '0'}, [('file', ASCENDING), ('seq', ASCENDING)]),
+    ('lab_reports', {'patient_id': 'P0001'}, [('reported_at', DESCENDING), ('_id', DESCENDING)]),
+    ('lab_report_cache', {'text_sha256': '0', 'extractor': 'x'}, None)
+]
+
+# Controller lookups no index can bound, left out of check_query_plans on purpose: an unanchored,
+# case-insensitive $regex reads every key of the index it uses, which is not a COLLSCAN but still
+# grows with the collection. Anchoring the pattern or a $text index would change what the search
+# matches.
+KNOWN_FULL_SCANS = [
+    ('forum', {'title': {'$regex': 'fever', '$options': 'i'}}, None)
+]
+
+
+# Create every index of the manifest. Returns {collection: [index names]}; an index that cannot be
+# built (e.g. duplicate values under a unique key) is reported as an error instead of stopping
+# the others.
+def ensure_indexes(db, log=print):
+    created = {}
+    errors = []
+    for collection_name, indexes in INDEX_MANIFEST.items():
+        collection = db[collection_name]
+        for spec in indexes:
+            options = {key: value for key, value in spec.items() if key != 'keys'}
+            try:
+                name = collection.create_index(spec['keys'], **options)
+                created.setdefault(collection_name, []).append(name)
+            except OperationFailure as e:
+                errors.append({'collection': collection_name, 'keys': spec['keys'], 'error': str(e)})
+                log(f"Could not create index {spec['keys']} on {collection_name}: {e}")
+    return {'indexes': created, 'errors': errors}
+
+
+def plan_stages(plan):
+    stages = [plan.get('stage')]
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        stages += plan_stages(child)
+    return [stage for stage in stages if stage]
+
+# Explain each controller query and report its winning plan; a query whose plan contains a
+# COLLSCAN fails the check. Needs a real MongoDB server.
+def check_query_plans(db):
+    results = []
+    for collection_name, query, sort in CONTROLLER_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        stages = plan_stages(cursor.explain()['queryPlanner']['winningPlan'])
+        results.append({
+            'collection': collection_name,
+            'query': query,
+            'sort': sort,
+            'stages': stages,
+            'ok': 'COLLSCAN' not in stages
+        })
+    return results
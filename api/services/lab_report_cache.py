@@ -0,0 +1,99 @@
+import datetime
+import hashlib
+import os
+
+from pymongo import ReturnDocument
+
+
+def sha256_hex(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+# whitespace-insensitive hash of extracted text, so a re-exported copy of the same report still matches
+def text_fingerprint(text):
+    return sha256_hex(' '.join(text.split()))
+
+
+# Content-addressed cache of parsed lab reports, stored in MongoDB so every worker shares it.
+# An entry is keyed on the normalized text hash and the extractor (LLM model + prompt) that
+# produced it, and remembers every PDF hash seen with that text, so an identical file is served
+# without even re-reading the PDF. Entries expire retention_days after their last hit through a
+# TTL index on expires_at; retention_days=0 disables the cache.
+class LabReportCache:
+    def __init__(self, collection, stats_collection, extractor, retention_days=None):
+        if retention_days is None:
+            retention_days = float(os.getenv('LAB_REPORT_CACHE_DAYS', 30))
+        self.collection = collection
+        self.stats_collection = stats_collection
+        self.extractor = extractor
+        self.retention_days = retention_days
+
+    @property
+    def enabled(self):
+        return self.retention_days > 0
+
+    def _expires_at(self):
+        return datetime.datetime.utcnow() + datetime.timedelta(days=self.retention_days)
+
+    def _count(self, counter):
+        self.stats_collection.update_one({'_id': 'lab_report_cache'}, {'$inc': {counter: 1}}, upsert=True)
+
+    def _hit(self, query, extra_update=None):
+        update = {'$set': {'expires_at': self._expires_at()}, '$inc': {'hits': 1}}
+        update.update(extra_update or {})
+        entry = self.collection.find_one_and_update(
+            {**query, 'extractor': self.extractor},
+            update,
+            projection={'result': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return entry['result'] if entry else None
+
+    # parsed result for exactly these PDF bytes, or None
+    def lookup_pdf(self, pdf_sha256):
+        if not self.enabled:
+            return None
+        result = self._hit({'pdf_sha256': pdf_sha256})
+        if result is not None:
+            self._count('pdf_hits')
+        return result
+
+    # parsed result for a different file with the same text; remembers the new PDF hash
+    def lookup_text(self, text_sha256, pdf_sha256):
+        if not self.enabled:
+            return None
+        result = self._hit({'text_sha256': text_sha256}, {'$addToSet': {'pdf_sha256': pdf_sha256}})
+        self._count('text_hits' if result is not None else 'misses')
+        return result
+
+    def put(self, pdf_sha256, text_sha256, result):
+        if not self.enabled:
+            return
+        self.collection.update_one(
+            {'text_sha256': text_sha256, 'extractor': self.extractor},
+            {
+                '$set': {'result': result, 'expires_at': self._expires_at()},
+                '$setOnInsert': {'created_at': datetime.datetime.utcnow(), 'hits': 0},
+                '$addToSet': {'pdf_sha256': pdf_sha256}
+            },
+            upsert=True
+        )
+
+    def stats(self):
+        counters = self.stats_collection.find_one({'_id': 'lab_report_cache'}) or {}
+        pdf_hits = counters.get('pdf_hits', 0)
+        text_hits = counters.get('text_hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = pdf_hits + text_hits + misses
+        return {
+            'enabled': self.enabled,
+            'retention_days': self.retention_days,
+            'extractor': self.extractor,
+            'entries': self.collection.count_documents({'extractor': self.extractor}),
+            'pdf_hits': pdf_hits,
+            'text_hits': text_hits,
+            'misses': misses,
+            'hit_rate': (pdf_hits + text_hits) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,208 @@
+import re
+
+# Lab report layouts that can be read without the LLM. A template matches when every marker is
+# on the first page; the results table is located on each page by its header labels, so small
+# shifts of the columns between pages do not matter. header_fields maps the labels of the
+# key/value block at the top of the report onto patient_info keys.
+LAB_REPORT_TEMPLATES = [
+    {
+        'name': 'lpl_test_report',
+        'markers': ['Test Report', 'Lab No.', 'Bio. Ref. Interval'],
+        'columns': {'name': 'Test Name', 'result': 'Results', 'unit': 'Units', 'range': 'Bio. Ref. Interval'},
+        'header_fields': {
+            'Name': 'name',
+            'Lab No.': 'lab_no',
+            'Age': 'age',
+            'Gender': 'gender',
+            'Collected': 'collected_at',
+            'Reported': 'reported_at',
+            'Collected at': 'lab'
+        }
+    }
+]
+
+# report test names (lower case, single spaces) -> canonical keys used by the prediction models
+CANONICAL_TEST_NAMES = {
+    'hba1c': 'HbA1c_level',
+    'glycosylated hemoglobin': 'HbA1c_level',
+    'glucose fasting': 'blood_glucose_level',
+    'glucose, fasting': 'blood_glucose_level',
+    'fasting blood glucose': 'blood_glucose_level',
+    'glucose random': 'blood_glucose_level',
+    'estimated average glucose (eag)': 'avg_glucose_level',
+    'cholesterol, total': 'Cholesterol',
+    'total cholesterol': 'Cholesterol',
+    'bmi': 'bmi',
+    'body mass index': 'bmi',
+    # printed with two spaces before "(TLC)", which is the key the criticality score reads
+    'total leukocyte count (tlc)': 'Total Leukocyte Count  (TLC)'
+}
+
+# canonical names reported under vitals rather than lab_results
+VITAL_NAMES = {'bmi', 'blood pressure', 'pulse', 'heart rate', 'temperature', 'spo2', 'respiratory rate'}
+
+NUMBER = re.compile(r'^-?\d+(?:\.\d+)?$')
+RANGE = re.compile(r'^(-?\d+(?:\.\d+)?)\s*-\s*(-?\d+(?:\.\d+)?)$')
+BOUND = re.compile(r'^(<=|>=|<|>|≤|≥)\s*(-?\d+(?:\.\d+)?)$')
+
+# vertical distance within which two lines count as the same table row
+ROW_TOLERANCE = 4
+
+
+def page_lines(page):
+    import fitz  # PyMuPDF
+    lines = []
+    # images (logos, barcodes) are most of the extraction time and never part of a result
+    for block in page.get_text('dict', flags=fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES)['blocks']:
+        for line in block.get('lines', []):
+            text = ''.join(span['text'] for span in line['spans'])
+            if text.strip():
+                x0, y0, x1, y1 = line['bbox']
+                lines.append((x0, y0, x1, y1, ' '.join(text.split())))
+    return lines
+
+def find_line(lines, label):
+    for line in lines:
+        if line[4].rstrip(' :') == label:
+            return line
+    return None
+
+def to_number(text):
+    return int(text) if re.fullmatch(r'-?\d+', text) else float(text)
+
+# True when value falls outside a reference range such as '13.00 - 17.00', '<200.00' or '>40'
+def out_of_range(value, reference_range):
+    match = RANGE.match(reference_range)
+    if match:
+        return value < float(match.group(1)) or value > float(match.group(2))
+    match = BOUND.match(reference_range)
+    if match:
+        operator, bound = match.group(1), float(match.group(2))
+        if operator == '<':
+            return value >= bound
+        if operator in ('<=', '≤'):
+            return value > bound
+        if operator == '>':
+            return value <= bound
+        return value < bound
+    return False
+
+def canonical_name(name):
+    return CANONICAL_TEST_NAMES.get(name.lower(), name)
+
+def header_value(lines, label_line):
+    x0, y0, x1, _, _ = label_line
+    candidates = [
+        line for line in lines
+        if line[0] >= x1 - 1 and abs(line[1] - y0) <= ROW_TOLERANCE and line[4] != ':'
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda line: line[0])
+
+def parse_header(lines, fields):
+    info = {}
+    for label, key in fields.items():
+        label_line = find_line(lines, label)
+        if not label_line:
+            continue
+        value_line = header_value(lines, label_line)
+        if not value_line:
+            continue
+        value = value_line[4]
+        if key == 'age':
+            match = re.match(r'\d+', value)
+            value = int(match.group()) if match else value
+        elif key == 'lab_no' and value.isdigit():
+            value = int(value)
+        info[key] = value
+        if key == 'lab':
+            # the address continues on the lines right below the lab name
+            address = []
+            last_y = value_line[3]
+            for line in sorted(lines, key=lambda line: line[1]):
+                if abs(line[0] - value_line[0]) <= 2 and 0 <= line[1] - last_y <= ROW_TOLERANCE:
+                    address.append(line[4])
+                    last_y = line[3]
+            if address:
+                info['lab_address'] = ' '.join(address)
+    return info
+
+def column_header(lines, columns):
+    name_line = find_line(lines, columns['name'])
+    if not name_line:
+        return None
+    header = {'name': name_line}
+    for column, label in columns.items():
+        line = find_line(lines, label)
+        if not line or abs(line[1] - name_line[1]) > ROW_TOLERANCE:
+            return None
+        header[column] = line
+    return header
+
+def cell(lines, y, x_min, x_max):
+    candidates = [line for line in lines if x_min <= line[0] < x_max and abs(line[1] - y) <= ROW_TOLERANCE]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda line: abs(line[1] - y))[4]
+
+# (test name, value, unit, reference range) for every numeric result in the page's table
+def parse_rows(lines, columns):
+    header = column_header(lines, columns)
+    if not header:
+        return []
+    result_x = header['result'][0]
+    unit_x = header['unit'][0]
+    range_x = header['range'][0]
+    top = header['name'][3]
+
+    rows = []
+    for x0, y0, x1, y1, text in sorted(lines, key=lambda line: line[1]):
+        if y0 <= top or not (result_x - 15 <= x0 < unit_x - 8) or not NUMBER.match(text):
+            continue
+        name = cell(lines, y0, 0, result_x - 20)
+        if not name or name.startswith('('):
+            continue
+        rows.append((name, to_number(text), cell(lines, y0, unit_x - 8, range_x - 8), cell(lines, y0, range_x - 8, float('inf'))))
+    return rows
+
+def parse_with_template(document, template):
+    if not document.page_count:
+        return None
+    first_page = page_lines(document[0])
+    if not all(find_line(first_page, marker) for marker in template['markers']):
+        return None
+    pages = [first_page] + [page_lines(document[i]) for i in range(1, document.page_count)]
+
+    vitals = {}
+    lab_results = {}
+    anomalies = []
+    for lines in pages:
+        for name, value, unit, reference_range in parse_rows(lines, template['columns']):
+            key = canonical_name(name)
+            section = vitals if key.lower() in VITAL_NAMES else lab_results
+            if key in section:
+                # the same test reported twice (e.g. as % and as an absolute count)
+                key = f'{key} ({unit})' if unit else f'{key} ({len(section)})'
+            section[key] = value
+            if reference_range and out_of_range(value, reference_range):
+                anomalies.append({'test_name': key, 'result': value, 'reference_range': reference_range, 'unit': unit or ''})
+
+    if not vitals and not lab_results:
+        return None
+    return {
+        'patient_info': parse_header(pages[0], template['header_fields']),
+        'anomalies': anomalies,
+        'vitals': vitals,
+        'lab_results': lab_results
+    }
+
+# (template name, parsed report) for a PDF in a known layout, or (None, None)
+def parse_lab_report(data):
+    import fitz  # PyMuPDF, imported on first use to keep it off the cold start
+    with fitz.open(stream=data, filetype='pdf') as document:
+        for template in LAB_REPORT_TEMPLATES:
+            result = parse_with_template(document, template)
+            if result is not None:
+                return template['name'], result
+    return None, None
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+
+# joblib (and the scikit-learn it unpickles) is only imported once a pickled model is loaded
+def joblib_load(path):
+    import joblib
+    return joblib.load(path)
+
+
+class UnknownModel(KeyError):
+    pass
+
+
+# A loaded model artifact plus the metadata needed to tell versions apart
+class ModelEntry:
+    def __init__(self, name, path, model, sha256, mtime, size_bytes, load_seconds):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.sha256 = sha256
+        self.mtime = mtime
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+    @property
+    def version(self):
+        return f"{self.sha256[:12]}-{int(self.mtime)}"
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'path': self.path,
+            'version': self.version,
+            'sha256': self.sha256,
+            'mtime': self.mtime,
+            'size_bytes': self.size_bytes,
+            'load_seconds': self.load_seconds,
+            'loaded_at': self.loaded_at
+        }
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# in-memory size of a loaded model; objects that know their footprint expose nbytes
+def estimate_size(obj):
+    nbytes = getattr(obj, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    try:
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return None
+
+
+# Loads each model once per process and hot-swaps it when the file on disk changes.
+# The file is stat'ed at most every check_interval seconds; a changed mtime or size
+# triggers a re-hash, and only a changed hash triggers a reload.
+class ModelRegistry:
+    def __init__(self, check_interval=None):
+        if check_interval is None:
+            check_interval = float(os.getenv('MODEL_RELOAD_INTERVAL', 5))
+        self.check_interval = check_interval
+        self._specs = {}
+        self._entries = {}
+        self._last_check = {}
+        self._stat = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, path, loader=None):
+        loader = loader or joblib_load
+        with self._lock:
+            self._specs[name] = (path, loader)
+            self._entries.pop(name, None)
+            self._last_check.pop(name, None)
+            self._stat.pop(name, None)
+
+    def get(self, name):
+        entry = self._entries.get(name)
+        if entry is not None and time.monotonic() - self._last_check.get(name, 0) < self.check_interval:
+            return entry
+        with self._lock:
+            return self._refresh(name)
+
+    def model(self, name):
+        return self.get(name).model
+
+    def reload(self, name=None):
+        with self._lock:
+            if name and name not in self._specs:
+                raise UnknownModel(f"Unknown model: {name}")
+            for n in [name] if name else list(self._specs):
+                # a missing artifact is reported as unavailable by info(); a loaded version stays
+                if not os.path.exists(self._specs[n][0]):
+                    continue
+                self._stat.pop(n, None)
+                self._entries.pop(n, None)
+                self._refresh(n)
+        return self.info()
+
+    def info(self):
+        result = {}
+        for name, (path, _) in self._specs.items():
+            entry = self._entries.get(name)
+            if entry is not None:
+                result[name] = entry.to_dict()
+            else:
+                result[name] = {'name': name, 'path': path, 'loaded': False, 'available': os.path.exists(path)}
+        return result
+
+    def _refresh(self, name):
+        if name not in self._specs:
+            raise UnknownModel(f"Unknown model: {name}")
+        path, loader = self._specs[name]
+        self._last_check[name] = time.monotonic()
+
+        st = os.stat(path)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        entry = self._entries.get(name)
+        if entry is not None and self._stat.get(name) == stat_key:
+            return entry
+
+        sha256 = file_sha256(path)
+        if entry is not None and entry.sha256 == sha256:
+            self._stat[name] = stat_key
+            return entry
+
+        start = time.perf_counter()
+        model = loader(path)
+        load_seconds = time.perf_counter() - start
+
+        entry = ModelEntry(name, path, model, sha256, st.st_mtime, estimate_size(model), load_seconds)
+        self._entries[name] = entry
+        self._stat[name] = stat_key
+        return entry
+
+
+# process-wide registry shared by every controller
+registry = ModelRegistry()
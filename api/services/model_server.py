@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+from services.model_registry import registry
+
+
+def _init_worker(modules):
+    # with fork the models registered (and preloaded) by the parent are inherited as-is;
+    # with spawn the modules that register them have to be imported again
+    for module in modules:
+        __import__(module)
+
+
+def _predict_in_worker(model_name, rows):
+    entry = registry.get(model_name)
+    return entry.version, list(entry.model.classes_), entry.model.predict_proba_rows(rows)
+
+
+# Serves predict_proba from a pool of worker processes so CPU-bound forest evaluation does not
+# hold the GIL of the threaded web worker. Requests arriving within window_ms of each other are
+# merged per model into one batch and dispatched to the pool as a single task.
+class ModelServer:
+    def __init__(self, workers=None, window_ms=2.0, max_batch=256, modules=()):
+        self.workers = workers or os.cpu_count() or 1
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.modules = tuple(modules)
+        self._queue = queue.Queue()
+        self._pool = None
+        self._dispatcher = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    def start(self):
+        with self._lock:
+            if self._pool is not None:
+                return self
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.modules,)
+            )
+            self._dispatcher = threading.Thread(target=self._dispatch, name='model-server-dispatch', daemon=True)
+            self._dispatcher.start()
+        return self
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is None:
+                return
+            self._queue.put(None)
+            self._dispatcher.join()
+            self._pool.shutdown()
+            self._pool = None
+            self._dispatcher = None
+
+    # (version, classes, probabilities) for the rows; blocks until the batch containing them is scored
+    def predict(self, model_name, rows, timeout=None):
+        future = Future()
+        self._queue.put((model_name, rows, future))
+        return future.result(timeout)
+
+    def stats(self):
+        return {'workers': self.workers, 'window_ms': self.window * 1000, 'max_batch': self.max_batch, 'requests': self.requests, 'batches': self.batches}
+
+    def _dispatch(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            size = len(item[1])
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                pending.append(item)
+                size += len(item[1])
+
+            by_model = {}
+            for model_name, rows, future in pending:
+                by_model.setdefault(model_name, []).append((rows, future))
+            for model_name, requests in by_model.items():
+                self._submit(model_name, requests)
+
+    def _submit(self, model_name, requests):
+        rows = [row for request_rows, _ in requests for row in request_rows]
+        self.requests += len(requests)
+        self.batches += 1
+        try:
+            task = self._pool.submit(_predict_in_worker, model_name, rows)
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            return
+
+        def split(task):
+            error = task.exception()
+            if error is not None:
+                for _, future in requests:
+                    future.set_exception(error)
+                return
+            version, classes, proba = task.result()
+            start = 0
+            for request_rows, future in requests:
+                future.set_result((version, classes, np.asarray(proba[start:start + len(request_rows)])))
+                start += len(request_rows)
+        task.add_done_callback(split)
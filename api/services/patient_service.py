@@ -1,14 +1,11 @@
-import fitz  # PyMuPDF
-import pymongo
-import os
 from services.gemini_service import extract_patient_info_and_anomalies
+from utils.db import collection
 
-# MongoDB setup
-client = pymongo.MongoClient(os.getenv("MONGO_URI"))
-db = client["medisynth"]
-patients_collection = db["patients"]
+# MongoDB setup, on the shared client
+patients_collection = collection("patients", "medisynth")
 
 def extract_text_from_pdf(pdf_file):
+    import fitz  # PyMuPDF
     document = fitz.open(stream=pdf_file.read(), filetype="pdf")
     text = ""
     for page in document:
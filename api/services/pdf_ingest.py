@@ -0,0 +1,54 @@
+import hashlib
+import os
+import tempfile
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+MAX_LAB_REPORT_BYTES = int(os.getenv('MAX_LAB_REPORT_BYTES', 20 * 1024 * 1024))
+LAB_REPORT_STORAGE = os.getenv('LAB_REPORT_STORAGE', 'disk')
+LAB_REPORT_DIR = os.getenv('LAB_REPORT_DIR', 'uploads')
+
+
+# read an uploaded file in chunks, refusing it as soon as it grows past max_bytes
+def read_upload(file, max_bytes=MAX_LAB_REPORT_BYTES, chunk_size=64 * 1024):
+    buffer = bytearray()
+    stream = file.stream if hasattr(file, 'stream') else file
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if len(buffer) + len(chunk) > max_bytes:
+            raise RequestEntityTooLarge(f'Lab report exceeds {max_bytes} bytes')
+        buffer += chunk
+    return bytes(buffer)
+
+
+# text of every page, opened straight from memory
+def extract_text_from_pdf_bytes(data):
+    import fitz  # PyMuPDF, imported on first use to keep it off the cold start
+    with fitz.open(stream=data, filetype='pdf') as document:
+        pages = [page.get_text() for page in document]
+    return ''.join(pages)
+
+
+# keep the original upload under a content-addressed name so same-named files never overwrite each other
+def store_lab_report(patient_id, data):
+    if LAB_REPORT_STORAGE == 'none':
+        return None
+    digest = hashlib.sha256(data).hexdigest()
+    directory = os.path.join(LAB_REPORT_DIR, secure_filename(patient_id) or '_')
+    path = os.path.join(directory, f'{digest}.pdf')
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        # a temp file of its own per writer: threads storing the same report never share one
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f'{digest}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return path
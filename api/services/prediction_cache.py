@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+# hash of the exact feature values a model is fed
+def feature_fingerprint(row):
+    payload = json.dumps(row, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# LRU of prediction results keyed on (model, model version, feature fingerprint).
+# Because the key is content-addressed a changed input or a reloaded model can never be
+# served a stale result; per-patient invalidation only drops entries that can no longer hit.
+class PredictionCache:
+    def __init__(self, max_entries=None):
+        if max_entries is None:
+            max_entries = int(os.getenv('PREDICTION_CACHE_SIZE', 10000))
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._patient_keys = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name, version, fingerprint):
+        key = (model_name, version, fingerprint)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, model_name, version, fingerprint, result, patient_id=None):
+        if self.max_entries <= 0:
+            return
+        key = (model_name, version, fingerprint)
+        with self._lock:
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            if patient_id is not None:
+                self._patient_keys.setdefault(patient_id, {})[model_name] = key
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # drop the entries a patient last used, for all models or the given ones
+    def invalidate(self, patient_id, model_names=None):
+        with self._lock:
+            keys = self._patient_keys.get(patient_id, {})
+            for model_name in list(keys):
+                if model_names is None or model_name in model_names:
+                    if self._entries.pop(keys.pop(model_name), None) is not None:
+                        self.invalidations += 1
+            if not keys:
+                self._patient_keys.pop(patient_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._patient_keys.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
+
+
+# process-wide cache shared by the diagnose endpoints
+prediction_cache = PredictionCache()
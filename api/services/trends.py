@@ -0,0 +1,81 @@
+import numbers
+
+import numpy as np
+
+# Time series of report values, bucketed and capped in numpy. Points are kept as arrays of epoch
+# milliseconds and float values; every series comes back in the same columnar form
+# ({'t', 'min', 'max', 'mean', 'count'}, one list each) whether or not it was downsampled, which is
+# compact to send and can be handed to a chart as is.
+TREND_WINDOWS = ('raw', 'day', 'week')
+
+DAY_MS = 24 * 60 * 60 * 1000
+# 1970-01-01 was a Thursday; shifting by three days makes weeks start on Monday
+WEEK_OFFSET_MS = 3 * DAY_MS
+
+
+def metric_value(value):
+    if value.__class__ is float or value.__class__ is int:
+        return float(value)
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return float(value)
+    # values read by the LLM sometimes come back as strings
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            return np.nan
+    return np.nan
+
+def window_keys(times, window):
+    if window == 'day':
+        return times // DAY_MS
+    if window == 'week':
+        return (times + WEEK_OFFSET_MS) // (7 * DAY_MS)
+    return np.arange(len(times))
+
+def window_start(keys, window):
+    if window == 'day':
+        return keys * DAY_MS
+    if window == 'week':
+        return keys * 7 * DAY_MS - WEEK_OFFSET_MS
+    return None
+
+# reduce consecutive runs of equal keys: first time, min, max, sum and count of each run
+def reduce_runs(keys, times, mins, maxs, sums, counts):
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return (
+        times[starts],
+        np.minimum.reduceat(mins, starts),
+        np.maximum.reduceat(maxs, starts),
+        np.add.reduceat(sums, starts),
+        np.add.reduceat(counts, starts)
+    )
+
+# Bucket one series by window, then merge neighbouring buckets until at most max_points remain.
+# times are epoch milliseconds; points without a numeric value are dropped.
+def downsample(times, values, window='raw', max_points=200):
+    times = np.asarray(times, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    keep = ~np.isnan(values)
+    times, values = times[keep], values[keep]
+    if not len(times):
+        return {'t': [], 'min': [], 'max': [], 'mean': [], 'count': []}
+    order = np.argsort(times, kind='stable')
+    times, values = times[order], values[order]
+
+    keys = window_keys(times, window)
+    t, mins, maxs, sums, counts = reduce_runs(keys, times, values, values, values, np.ones(len(values), dtype=np.int64))
+    if window != 'raw':
+        t = window_start(keys[np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])], window)
+
+    if len(t) > max_points:
+        groups = np.arange(len(t)) * max_points // len(t)
+        t, mins, maxs, sums, counts = reduce_runs(groups, t, mins, maxs, sums, counts)
+
+    return {
+        't': t.tolist(),
+        'min': mins.tolist(),
+        'max': maxs.tolist(),
+        'mean': (sums / counts).tolist(),
+        'count': counts.tolist()
+    }
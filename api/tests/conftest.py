@@ -0,0 +1,29 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+# the app imports its modules relative to api/, as index.py does when it is served
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(API_DIR)
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+# never create indexes on a real server while a test imports index
+os.environ.setdefault('ENSURE_INDEXES_ON_STARTUP', '0')
+
+
+# An in-memory database behind the shared client, so controllers run unchanged, with the indexes
+# of the manifest as `manage.py ensure-indexes` creates them on a deployed database
+@pytest.fixture
+def mongo():
+    from services.indexes import ensure_indexes
+    from utils import db
+
+    previous = db.client
+    db.client = mongomock.MongoClient()
+    database = db.get_database()
+    ensure_indexes(database, log=lambda message: None)
+    yield database
+    db.client = previous
@@ -0,0 +1,147 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from controllers.patient_controller import calculate_criticality_score
+from services.criticality import criticality_scores, top_k
+
+ANOMALY_TESTS = ['Red Cell Distribution Width (RDW)', 'Mean Platelet Volume', 'Other Test']
+LAB_TESTS = ['Hemoglobin', 'Platelet Count', 'Total Leukocyte Count  (TLC)']
+
+
+# patient documents with every section optional and values of the types stored in practice
+def random_patient(rnd):
+    patient = {}
+    manual_inputs = {
+        'RestingBP': lambda: rnd.choice([rnd.randint(80, 200), rnd.uniform(80, 200)]),
+        'MaxHR': lambda: rnd.randint(50, 210),
+        'ExerciseAngina': lambda: rnd.choice('YN'),
+        'Cholesterol': lambda: rnd.uniform(0, 600),
+        'Oldpeak': lambda: rnd.uniform(-2, 6),
+        'RestingECG': lambda: rnd.choice(['Normal', 'Abnormal', 'ST', 'LVH']),
+        'ST_Slope': lambda: rnd.choice(['Up', 'Flat', 'Down', 'x'])
+    }
+    if rnd.random() < 0.9:
+        patient['manual_data'] = {key: value() for key, value in manual_inputs.items() if rnd.random() < 0.8}
+    if rnd.random() < 0.8:
+        patient['lab_results'] = {key: rnd.uniform(0, 500) for key in LAB_TESTS if rnd.random() < 0.7}
+    if rnd.random() < 0.8:
+        patient['vitals'] = {'ChestPainType': rnd.choice(['ATA', 'NAP', 'ASY', 'TA', '?'])}
+    if rnd.random() < 0.7:
+        patient['anomalies'] = [
+            {'test_name': rnd.choice(ANOMALY_TESTS), 'result': rnd.uniform(0, 30)} for _ in range(rnd.randint(0, 3))
+        ]
+    if rnd.random() < 0.9:
+        patient['patient_info'] = {'age': rnd.randint(1, 100)} if rnd.random() < 0.9 else {}
+    return patient
+
+def scalar_score(patient):
+    try:
+        return calculate_criticality_score(patient)
+    except (TypeError, AttributeError, KeyError):
+        return math.nan
+
+def assert_same_scores(patients):
+    expected = np.array([scalar_score(patient) for patient in patients], dtype=np.float64)
+    np.testing.assert_array_equal(criticality_scores(patients), expected)
+
+
+def test_vectorized_scores_match_scalar():
+    rnd = random.Random(0)
+    assert_same_scores([random_patient(rnd) for _ in range(5000)])
+
+# documents the scalar function raises on score NaN in the vectorized one
+@pytest.mark.parametrize('patient', [
+    {'manual_data': None},
+    {'lab_results': None},
+    {'manual_data': {'RestingBP': '120'}},
+    {'manual_data': {'MaxHR': None}},
+    {'lab_results': {'Hemoglobin': '13.5'}},
+    {'patient_info': {'age': 'fifty'}},
+    {'anomalies': [{'test_name': 'Mean Platelet Volume', 'result': '9'}]},
+    {'anomalies': [{'result': 9}]},
+    {'anomalies': None}
+])
+def test_unscorable_patients_are_nan(patient):
+    with pytest.raises((TypeError, AttributeError, KeyError)):
+        calculate_criticality_score(patient)
+    assert np.isnan(criticality_scores([patient])[0])
+
+def test_scores_of_mixed_batch():
+    rnd = random.Random(1)
+    patients = [random_patient(rnd) for _ in range(200)]
+    patients[10] = {'manual_data': {'RestingBP': '120'}}
+    patients[20] = {'manual_data': None}
+    assert_same_scores(patients)
+
+def test_top_k_skips_nan():
+    scores = np.array([1, 5, np.nan, 3, 5, 2.])
+    assert top_k(scores, 3).tolist() == [1, 4, 3]
+    assert top_k(scores, 10).tolist() == [1, 4, 3, 5, 0]
+    assert top_k(np.array([]), 3).tolist() == []
+
+
+def test_stale_snapshot_does_not_replace_a_newer_score(mongo):
+    from controllers.patient_controller import manual_input, store_criticality_scores
+
+    mongo['patients'].insert_one({'patient_id': 'P1', 'manual_data': {'RestingBP': 120}})
+    stale = mongo['patients'].find_one({'patient_id': 'P1'})
+    current = manual_input('P1', {'RestingBP': 190})
+    # the slower writer stores the score of the snapshot it read before the update
+    store_criticality_scores([stale])
+    stored = mongo['patients'].find_one({'patient_id': 'P1'})
+    assert stored['criticality_score'] == calculate_criticality_score(current) != calculate_criticality_score(stale)
+
+def test_rescore_chunk_skips_patients_changed_since_read(mongo):
+    from controllers.patient_controller import manual_input
+    from controllers.rescore_controller import rescore_chunk
+
+    mongo['patients'].insert_one({'patient_id': 'P1', 'manual_data': {'RestingBP': 120}})
+    stale = mongo['patients'].find_one({'patient_id': 'P1'})
+    current = manual_input('P1', {'RestingBP': 190})
+    mongo['patients'].bulk_write(rescore_chunk([stale]), ordered=False)
+    assert mongo['patients'].find_one({'patient_id': 'P1'})['criticality_score'] == calculate_criticality_score(current)
+
+def test_triage_reads_backfilled_scores_without_writing(mongo):
+    from controllers import patient_controller
+
+    rnd = random.Random(2)
+    patients = [{**random_patient(rnd), 'patient_id': f'P{i:03d}'} for i in range(30)]
+    mongo['patients'].insert_many([dict(patient) for patient in patients])
+    # patients stored before scores were kept on write are left out until they are backfilled
+    assert patient_controller.get_triage(k=5)['patients'] == []
+
+    assert patient_controller.backfill_criticality_scores(limit=20) == 20
+    assert patient_controller.backfill_criticality_scores(limit=20) == 10
+    assert mongo['patients'].count_documents({'criticality_score': {'$exists': False}}) == 0
+
+    stored = list(mongo['patients'].find({}, sort=[('patient_id', 1)]))
+    triage = patient_controller.get_triage(k=5)
+    assert list(mongo['patients'].find({}, sort=[('patient_id', 1)])) == stored
+
+    expected = sorted(
+        ((score, patient['patient_id']) for patient in patients if not math.isnan(score := scalar_score(patient))),
+        key=lambda item: -item[0]
+    )[:5]
+    assert [patient['patient_id'] for patient in triage['patients']] == [patient_id for _, patient_id in expected]
+    assert triage == patient_controller.get_triage(k=5, live=False)
+
+def test_llm_criticality_score_leaves_the_stored_score_alone(mongo, monkeypatch):
+    from types import SimpleNamespace
+    from controllers import care_plan_controller
+    from controllers.patient_controller import get_triage, manual_input
+
+    text = '```json\n{"criticality_score": "9.50", "criticality_level": "high"}\n```'
+    response = SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=text)]))])
+    monkeypatch.setattr(care_plan_controller, 'generative_model', lambda name: SimpleNamespace(generate_content=lambda prompt: response))
+
+    mongo['patients'].insert_one({'patient_id': 'P1', 'manual_data': {'RestingBP': 120}})
+    scored = manual_input('P1', {'RestingBP': 180})
+    assert care_plan_controller.det_criticality_score('P1')['criticality_score'] == '9.50'
+
+    patient = mongo['patients'].find_one({'patient_id': 'P1'})
+    assert patient['criticality_score'] == scored['criticality_score']
+    assert patient['llm_criticality_score'] == '9.50' and patient['llm_criticality_level'] == 'high'
+    assert [entry['patient_id'] for entry in get_triage(k=5)['patients']] == ['P1']
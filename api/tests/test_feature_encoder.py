@@ -0,0 +1,157 @@
+import math
+import os
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import REPO_DIR
+from services.feature_encoder import EncodedModel
+from services.model_registry import joblib_load
+
+HEART_MODEL = os.path.join(REPO_DIR, 'models', 'heart_rf_model.pkl')
+HEART_COLUMNS = ['Age', 'RestingBP', 'Cholesterol', 'FastingBS', 'MaxHR', 'Oldpeak', 'Sex', 'ChestPainType', 'RestingECG', 'ExerciseAngina', 'ST_Slope']
+
+
+@pytest.fixture(scope='module')
+def heart_model():
+    if not os.path.exists(HEART_MODEL):
+        pytest.skip('heart model artifact not available')
+    model = EncodedModel(joblib_load(HEART_MODEL), HEART_COLUMNS)
+    assert model.encoder is not None
+    return model
+
+
+# Rows the way build_model_row hands them over: every column present, with every kind of gap the
+# encoder must handle. (A column absent from a row encodes as 0, like a single-row DataFrame; in a
+# multi-row DataFrame it would be imputed instead whenever another row has it, so absent columns
+# are only compared one row at a time.)
+def heart_rows(rnd, n):
+    numeric = {
+        'Age': lambda: rnd.randint(20, 90),
+        'RestingBP': lambda: rnd.uniform(80, 200),
+        'Cholesterol': lambda: rnd.choice([0, rnd.randint(80, 600)]),
+        'FastingBS': lambda: rnd.randint(0, 1),
+        'MaxHR': lambda: rnd.randint(60, 202),
+        'Oldpeak': lambda: round(rnd.uniform(-2, 6), 1)
+    }
+    categorical = {
+        'Sex': ['M', 'F'],
+        'ChestPainType': ['ATA', 'NAP', 'ASY', 'TA'],
+        'RestingECG': ['Normal', 'ST', 'LVH'],
+        'ExerciseAngina': ['N', 'Y'],
+        'ST_Slope': ['Up', 'Flat', 'Down']
+    }
+    rows = []
+    for _ in range(n):
+        row = {}
+        for column, value in numeric.items():
+            case = rnd.random()
+            if case < 0.1:
+                row[column] = None
+            elif case < 0.15:
+                row[column] = math.nan
+            else:
+                row[column] = value()
+        for column, values in categorical.items():
+            case = rnd.random()
+            if case < 0.05:
+                row[column] = None
+            elif case < 0.1:
+                row[column] = math.nan
+            elif case < 0.15:
+                row[column] = 'Unknown category'
+            else:
+                row[column] = rnd.choice(values)
+        rows.append(row)
+    return rows
+
+def dataframe_proba(model, rows):
+    features = pd.DataFrame(rows).reindex(columns=model.columns, fill_value=0)
+    return model.pipeline.predict_proba(features)
+
+
+def test_encoder_matches_dataframe_path(heart_model):
+    rows = heart_rows(random.Random(0), 2000)
+    np.testing.assert_array_equal(heart_model.predict_proba_rows(rows), dataframe_proba(heart_model, rows))
+
+@pytest.mark.parametrize('row', [
+    {},
+    {'Age': None, 'RestingBP': None, 'Cholesterol': None, 'MaxHR': None, 'Oldpeak': None},
+    {'Sex': None, 'ChestPainType': math.nan, 'RestingECG': 'Unknown', 'ExerciseAngina': 'maybe', 'ST_Slope': 0},
+    {'Age': 54, 'Sex': 'M', 'ChestPainType': 'ASY', 'RestingBP': 140, 'Cholesterol': 239, 'FastingBS': 0, 'RestingECG': 'Normal', 'MaxHR': 160, 'ExerciseAngina': 'N', 'Oldpeak': 1.2, 'ST_Slope': 'Flat'}
+])
+def test_encoder_matches_dataframe_path_single_row(heart_model, row):
+    np.testing.assert_array_equal(heart_model.predict_proba_rows([row]), dataframe_proba(heart_model, [row]))
+
+def test_encoded_matrix_matches_column_transformer(heart_model):
+    rows = heart_rows(random.Random(1), 500)
+    features = pd.DataFrame(rows).reindex(columns=heart_model.columns, fill_value=0)
+    expected = heart_model.pipeline.steps[0][1].transform(features)
+    expected = expected.toarray() if hasattr(expected, 'toarray') else expected
+    np.testing.assert_array_equal(heart_model.encoder.encode(rows), expected)
+
+
+def fitted_pipeline(scaler, imputer=None):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    rnd = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        'a': rnd.normal(50, 10, 200),
+        'b': rnd.normal(-3, 2, 200),
+        'c': rnd.choice(['x', 'y', 'z'], 200, p=[0.6, 0.3, 0.1])
+    })
+    target = (frame['a'] > 50) ^ (frame['c'] == 'y')
+    preprocessor = ColumnTransformer([
+        ('num', Pipeline([('imputer', imputer or SimpleImputer()), ('scaler', scaler)]), ['a', 'b']),
+        ('cat', Pipeline([('imputer', SimpleImputer(strategy='most_frequent')), ('onehot', OneHotEncoder(handle_unknown='ignore'))]), ['c'])
+    ])
+    return Pipeline([('preprocessor', preprocessor), ('model', RandomForestClassifier(n_estimators=5, random_state=0))]).fit(frame, target)
+
+SMALL_ROWS = [
+    {'a': 41.0, 'b': -1.5, 'c': 'y'},
+    {'a': None, 'b': 2.0, 'c': None},
+    {'a': 63.0, 'b': math.nan, 'c': math.nan},
+    {'a': 55.0, 'b': -4.0, 'c': 'unseen'}
+]
+
+# sklearn's reference: None is a missing value, so it reaches the imputers as NaN
+def reference_features(rows):
+    features = pd.DataFrame([{key: math.nan if value is None else value for key, value in row.items()} for row in rows])
+    return features.astype({'c': object})
+
+@pytest.mark.parametrize('with_mean, with_std', [(True, True), (False, True), (True, False), (False, False)])
+def test_encoder_honours_scaler_options(with_mean, with_std):
+    from sklearn.preprocessing import StandardScaler
+
+    model = EncodedModel(fitted_pipeline(StandardScaler(with_mean=with_mean, with_std=with_std)), ['a', 'b', 'c'])
+    assert model.encoder is not None
+    expected = model.pipeline.steps[0][1].transform(reference_features(SMALL_ROWS))
+    expected = expected.toarray() if hasattr(expected, 'toarray') else expected
+    np.testing.assert_allclose(model.encoder.encode(SMALL_ROWS), expected, rtol=0, atol=1e-12)
+
+def test_none_category_is_imputed_like_nan():
+    from sklearn.preprocessing import StandardScaler
+
+    model = EncodedModel(fitted_pipeline(StandardScaler()), ['a', 'b', 'c'])
+    encoded = model.encoder.encode(SMALL_ROWS)
+    # the most frequent category fills both gaps, not the all-zero row of an unknown value
+    np.testing.assert_array_equal(encoded[1, 2:], encoded[2, 2:])
+    assert encoded[1, 2:].tolist() == [1, 0, 0]
+    np.testing.assert_array_equal(model.predict_proba_rows(SMALL_ROWS), model.pipeline.predict_proba(reference_features(SMALL_ROWS)))
+
+    # the DataFrame fallback treats None the same way
+    model.encoder = None
+    np.testing.assert_array_equal(model.predict_proba_rows(SMALL_ROWS), model.pipeline.predict_proba(reference_features(SMALL_ROWS)))
+
+def test_other_missing_value_markers_fall_back_to_the_pipeline():
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import StandardScaler
+
+    model = EncodedModel(fitted_pipeline(StandardScaler(), SimpleImputer(missing_values=-1.0)), ['a', 'b', 'c'])
+    assert model.encoder is None
@@ -0,0 +1,48 @@
+import os
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.feature_encoder import FeatureEncoder
+from services.forest_engine import export_pipeline, load_compact_model
+from services.model_registry import joblib_load
+from test_feature_encoder import HEART_COLUMNS, HEART_MODEL, heart_rows
+
+
+@pytest.fixture(scope='module')
+def heart_pipeline():
+    if not os.path.exists(HEART_MODEL):
+        pytest.skip('heart model artifact not available')
+    return joblib_load(HEART_MODEL)
+
+@pytest.fixture(scope='module')
+def compact_model(heart_pipeline, tmp_path_factory):
+    path = tmp_path_factory.mktemp('models') / 'heart_rf_model.npz'
+    export_pipeline(heart_pipeline, str(path))
+    return load_compact_model(str(path))
+
+@pytest.fixture(scope='module')
+def encoded(heart_pipeline):
+    return FeatureEncoder.from_pipeline(heart_pipeline).encode(heart_rows(random.Random(2), 3000))
+
+
+def test_compact_forest_is_bit_identical(heart_pipeline, compact_model, encoded):
+    forest = heart_pipeline.steps[-1][1]
+    np.testing.assert_array_equal(compact_model.forest.predict_proba(encoded), forest.predict_proba(encoded))
+    np.testing.assert_array_equal(compact_model.forest.predict(encoded), forest.predict(encoded))
+
+# inputs sitting exactly on a split threshold must take the same branch as sklearn
+def test_compact_forest_on_thresholds(heart_pipeline, compact_model, encoded):
+    forest = heart_pipeline.steps[-1][1]
+    tree = forest.estimators_[0].tree_
+    internal = np.flatnonzero(tree.children_left != -1)
+    X = np.resize(encoded, (len(internal), encoded.shape[1])).copy()
+    X[np.arange(len(internal)), tree.feature[internal]] = tree.threshold[internal]
+    np.testing.assert_array_equal(compact_model.forest.predict_proba(X), forest.predict_proba(X))
+
+def test_compact_model_rows_match_pipeline(heart_pipeline, compact_model):
+    rows = heart_rows(random.Random(3), 500)
+    expected = heart_pipeline.predict_proba(pd.DataFrame(rows).reindex(columns=HEART_COLUMNS, fill_value=0))
+    np.testing.assert_array_equal(compact_model.predict_proba_rows(rows), expected)
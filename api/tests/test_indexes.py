@@ -0,0 +1,37 @@
+import os
+import uuid
+
+import pytest
+from pymongo import MongoClient
+
+from services.indexes import CONTROLLER_QUERIES, check_query_plans, ensure_indexes
+
+# Query plans need a real server: MONGO_TEST_URI points at one the test may create a throwaway
+# database on (e.g. mongodb://localhost:27017)
+MONGO_TEST_URI = os.getenv('MONGO_TEST_URI')
+
+pytestmark = pytest.mark.skipif(not MONGO_TEST_URI, reason='MONGO_TEST_URI is not set')
+
+
+@pytest.fixture(scope='module')
+def plans():
+    client = MongoClient(MONGO_TEST_URI, serverSelectionTimeoutMS=5000)
+    name = f'test_indexes_{uuid.uuid4().hex[:8]}'
+    try:
+        db = client[name]
+        result = ensure_indexes(db, log=lambda message: None)
+        assert result['errors'] == []
+        yield {(plan['collection'], repr(plan['query']), repr(plan['sort'])): plan for plan in check_query_plans(db)}
+    finally:
+        client.drop_database(name)
+        client.close()
+
+
+@pytest.mark.parametrize(
+    'collection_name, query, sort',
+    CONTROLLER_QUERIES,
+    ids=[f'{collection_name}:{sorted(query)}' for collection_name, query, sort in CONTROLLER_QUERIES]
+)
+def test_controller_query_uses_an_index(plans, collection_name, query, sort):
+    plan = plans[(collection_name, repr(query), repr(sort))]
+    assert 'COLLSCAN' not in plan['stages'], plan
@@ -0,0 +1,41 @@
+import datetime
+
+import pytest
+
+from controllers.lab_report_controller import save_lab_reports
+from models.lab_report import LabReport
+
+SAME_TIME = datetime.datetime(2023, 5, 16, 13, 36, 25)
+
+
+@pytest.fixture
+def client(mongo):
+    from index import app
+
+    # most reports printed at the same time, so pages break in the middle of them
+    times = [SAME_TIME] * 7 + [SAME_TIME - datetime.timedelta(days=1), SAME_TIME + datetime.timedelta(days=1), None]
+    save_lab_reports([LabReport(f'report-{i}', 'P1', None, reported_at, {}) for i, reported_at in enumerate(times)])
+    return app.test_client()
+
+
+@pytest.mark.parametrize('limit', [1, 3, 7, 10])
+def test_history_pages_through_equal_timestamps(client, limit):
+    seen = []
+    cursor = ''
+    while True:
+        response = client.get(f'/patients/P1/lab_reports/history?limit={limit}&cursor={cursor}')
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page['reports']) <= limit
+        seen += [report['report_id'] for report in page['reports']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert sorted(seen) == sorted(f'report-{i}' for i in range(10))
+    assert seen[0] == 'report-8' and seen[-2:] == ['report-7', 'report-9']
+
+@pytest.mark.parametrize('query', ['cursor=2023-05-16', 'cursor=yesterday_64b7f0c2e4b0a1a2b3c4d5e6', 'limit=abc', 'limit=0'])
+def test_history_rejects_bad_parameters(client, query):
+    response = client.get(f'/patients/P1/lab_reports/history?{query}')
+    assert response.status_code == 400
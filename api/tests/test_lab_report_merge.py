@@ -0,0 +1,193 @@
+import datetime
+import io
+import threading
+import time
+
+import mongomock
+import pytest
+
+from controllers import patient_controller
+from controllers.patient_controller import manual_input, merge_lab_report
+
+THREADS = 50
+
+
+@pytest.fixture
+def slow_reads(monkeypatch):
+    # a network round trip per read, so a read-modify-write merge would lose updates
+    find_one = mongomock.collection.Collection.find_one
+
+    def slow_find_one(self, *args, **kwargs):
+        document = find_one(self, *args, **kwargs)
+        time.sleep(0.002)
+        return document
+    monkeypatch.setattr(mongomock.collection.Collection, 'find_one', slow_find_one)
+
+def run_concurrently(target, args_list):
+    errors = []
+
+    def run(*args):
+        try:
+            target(*args)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=run, args=args) for args in args_list]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+# every report printed at the same time, each with values of its own
+def report(i):
+    return {
+        'patient_info': {'name': 'Concurrent Patient', 'reported_at': '16/5/2023 1:36:25PM'},
+        'vitals': {f'vital_{i}': i},
+        'lab_results': {'Hemoglobin': 12 + i % 3, f'test_{i}': i, f'dotted.name {i}': i},
+        'anomalies': [{'test_name': f'test_{i}', 'result': i}]
+    }
+
+
+def test_concurrent_lab_report_merges_lose_nothing(mongo, slow_reads):
+    run_concurrently(merge_lab_report, [('P1', report(i), f'report-{i}') for i in range(THREADS)])
+
+    patients = list(mongo['patients'].find({'patient_id': 'P1'}))
+    assert len(patients) == 1
+    patient = patients[0]
+    assert patient['vitals'] == {f'vital_{i}': i for i in range(THREADS)}
+    for i in range(THREADS):
+        assert patient['lab_results'][f'test_{i}'] == i
+        assert patient['lab_results'][f'dotted_name {i}'] == i
+    # the snapshot holds the anomalies of one report, the history holds every report
+    assert len(patient['anomalies']) == 1
+    assert mongo['lab_reports'].count_documents({'patient_id': 'P1'}) == THREADS
+    assert patient['criticality_score'] == patient_controller.calculate_criticality_score(patient)
+
+def test_concurrent_manual_input_loses_nothing(mongo, slow_reads):
+    mongo['patients'].insert_one({'patient_id': 'P2', 'manual_data': {'RestingBP': 120}})
+    run_concurrently(manual_input, [('P2', {f'field_{i}': i, 'MaxHR': 100 + i}) for i in range(THREADS)])
+
+    patient = mongo['patients'].find_one({'patient_id': 'P2'})
+    assert patient['manual_data']['RestingBP'] == 120
+    assert all(patient['manual_data'][f'field_{i}'] == i for i in range(THREADS))
+    assert patient['manual_data']['MaxHR'] in range(100, 100 + THREADS)
+
+def test_merge_creates_the_patient_once(mongo):
+    merge_lab_report('P3', report(0), 'first')
+    merge_lab_report('P3', report(1), 'second')
+    patient = mongo['patients'].find_one({'patient_id': 'P3'})
+    assert mongo['patients'].count_documents({'patient_id': 'P3'}) == 1
+    assert patient['staffs_assigned'] == [] and patient['isEmergency'] is False
+    assert patient['vitals'] == {'vital_0': 0, 'vital_1': 1}
+
+def dated_report(reported_at, hemoglobin, **lab_results):
+    return {
+        'patient_info': {'reported_at': reported_at},
+        'lab_results': {'Hemoglobin': hemoglobin, **lab_results},
+        'anomalies': [{'test_name': 'Hemoglobin', 'result': hemoglobin}]
+    }
+
+def test_late_older_report_does_not_overwrite_newer_values(mongo):
+    merge_lab_report('P4', dated_report('2/6/2023 9:00AM', 13.5), 'newer')
+    patient = merge_lab_report('P4', dated_report('1/6/2023 9:00AM', 9.0, Platelets=150), 'older')
+
+    assert patient['lab_results'] == {'Hemoglobin': 13.5}
+    assert patient['anomalies'] == [{'test_name': 'Hemoglobin', 'result': 13.5}]
+    assert patient['latest_reported_at'] == datetime.datetime(2023, 6, 2, 9, 0)
+    # the late report is still in the history
+    assert mongo['lab_reports'].count_documents({'patient_id': 'P4'}) == 2
+
+    patient = merge_lab_report('P4', dated_report('3/6/2023 9:00AM', 11.0), 'newest')
+    assert patient['lab_results'] == {'Hemoglobin': 11.0}
+    assert patient['criticality_score'] == patient_controller.calculate_criticality_score(patient)
+
+# Imports of cached reports: the files' bytes name them, and each parses to cached[bytes]
+@pytest.fixture
+def cached(monkeypatch):
+    from controllers import lab_import_controller
+    from services import pdf_ingest
+
+    results = {}
+    monkeypatch.setattr(pdf_ingest, 'LAB_REPORT_STORAGE', 'none')
+    monkeypatch.setattr(
+        lab_import_controller.lab_report_cache, 'lookup_pdf',
+        lambda pdf_sha256: {lab_import_controller.sha256_hex(data): result for data, result in results.items()}.get(pdf_sha256)
+    )
+    return results
+
+def import_cached(cached, patients):
+    from controllers.lab_import_controller import import_lab_reports
+
+    files = [(f'{data.decode()}.pdf', data) for data in cached]
+    return import_lab_reports(files, {f'{data.decode()}.pdf': patients(data) for data in cached}, workers=0)
+
+
+def test_import_applies_only_reports_newer_than_the_snapshot(mongo, cached):
+    cached.update({
+        b'day-3': dated_report('3/6/2023 9:00AM', 3, Platelets=3),
+        b'day-7': dated_report('7/6/2023 9:00AM', 7),
+        b'day-4': dated_report('4/6/2023 9:00AM', 4, Platelets=4),
+        b'new-1': dated_report('1/6/2023 9:00AM', 1, Platelets=1),
+        b'new-2': dated_report('2/6/2023 9:00AM', 2)
+    })
+    merge_lab_report('P6', dated_report('5/6/2023 9:00AM', 5), 'day-5')
+
+    outcome = import_cached(cached, lambda data: 'P7' if data.startswith(b'new') else 'P6')
+    assert outcome['summary'] == {'files': 5, 'patients': 2, 'merged': 5}
+
+    patient = mongo['patients'].find_one({'patient_id': 'P6'})
+    assert patient['lab_results'] == {'Hemoglobin': 7}
+    assert mongo['lab_reports'].count_documents({'patient_id': 'P6'}) == 4
+    # a new patient gets all of its reports, oldest first
+    patient = mongo['patients'].find_one({'patient_id': 'P7'})
+    assert patient['lab_results'] == {'Hemoglobin': 2, 'Platelets': 1}
+    assert patient['staffs_assigned'] == []
+
+def test_import_reports_a_partly_failed_bulk_write_per_file(mongo, cached, monkeypatch):
+    from pymongo.errors import BulkWriteError
+
+    cached.update({
+        b'p8-day-1': dated_report('1/6/2023 9:00AM', 1),
+        b'p9-day-2': dated_report('2/6/2023 9:00AM', 2),
+        b'p8-day-3': dated_report('3/6/2023 9:00AM', 3)
+    })
+    bulk_write = mongomock.collection.Collection.bulk_write
+
+    # the server applies the first update of the ordered snapshot write, rejects the second and
+    # stops there
+    def failing_bulk_write(self, operations, ordered=True, **kwargs):
+        if self.name != 'patients' or not ordered:
+            return bulk_write(self, operations, ordered=ordered, **kwargs)
+        bulk_write(self, operations[:1], ordered=ordered)
+        raise BulkWriteError({
+            'writeErrors': [{'index': 1, 'code': 28, 'errmsg': 'Cannot create field in element', 'op': {}}],
+            'writeConcernErrors': [], 'nInserted': 0, 'nUpserted': 0, 'nMatched': 1, 'nModified': 1, 'nRemoved': 0, 'upserted': []
+        })
+    monkeypatch.setattr(mongomock.collection.Collection, 'bulk_write', failing_bulk_write)
+
+    outcome = import_cached(cached, lambda data: data.decode()[:2].upper())
+    statuses = {file['filename']: (file['status'], file.get('error')) for file in outcome['files']}
+    assert statuses == {
+        'p8-day-1.pdf': ('merged', None),
+        'p9-day-2.pdf': ('failed', 'Cannot create field in element'),
+        'p8-day-3.pdf': ('failed', 'Not merged: an earlier update of this import failed')
+    }
+    patient = mongo['patients'].find_one({'patient_id': 'P8'})
+    assert patient['lab_results'] == {'Hemoglobin': 1}
+    assert patient['criticality_score'] == patient_controller.calculate_criticality_score(patient)
+
+@pytest.mark.parametrize('mapping', ['[["a.pdf", "P1"]]', '"P1"', 'null', 'not json'])
+def test_import_rejects_a_mapping_that_is_not_an_object(mongo, mapping):
+    import json
+    from index import app
+    from controllers.lab_import_controller import import_lab_reports
+
+    response = app.test_client().post(
+        '/patients/import_lab_reports?sync=1',
+        data={'files': (io.BytesIO(b'%PDF'), 'a.pdf'), 'mapping': mapping},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'mapping must be a JSON object'}
+    if mapping != 'not json' and mapping != 'null':
+        assert import_lab_reports([('a.pdf', b'%PDF')], json.loads(mapping)) == {'error': 'mapping must be a JSON object'}
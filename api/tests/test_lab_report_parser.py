@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from conftest import REPO_DIR
+from services.criticality import criticality_inputs
+from services.lab_report_parser import parse_lab_report
+
+SAMPLE_REPORT = os.path.join(REPO_DIR, 'uploads', 'lab report sample.pdf')
+
+
+@pytest.fixture(scope='module')
+def sample_report():
+    pytest.importorskip('fitz')
+    if not os.path.exists(SAMPLE_REPORT):
+        pytest.skip('sample lab report not available')
+    with open(SAMPLE_REPORT, 'rb') as f:
+        return parse_lab_report(f.read())
+
+
+def test_sample_report_matches_template(sample_report):
+    template, result = sample_report
+    assert template == 'lpl_test_report'
+    assert result['lab_results']['HbA1c_level'] is not None
+
+# The score reads the TLC under the label as the report prints it, with two spaces. (The sample's
+# TLC happens to equal the default of 8, so the key is what tells a read value from the fallback.)
+def test_tlc_reaches_the_criticality_score(sample_report):
+    _, result = sample_report
+    lab_results = result['lab_results']
+    assert 'Total Leukocyte Count (TLC)' not in lab_results
+    assert 'Total Leukocyte Count  (TLC)' in lab_results
+    lab_results = {**lab_results, 'Total Leukocyte Count  (TLC)': 12.5}
+    assert criticality_inputs([{'lab_results': lab_results}])['tlc'][0] == 12.5
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from services.model_registry import ModelRegistry, UnknownModel
+
+
+@pytest.fixture
+def loads():
+    return []
+
+# loads each file's content as its model, recording every load
+@pytest.fixture
+def loader(loads):
+    def load(path):
+        loads.append(path)
+        with open(path) as f:
+            return f.read()
+    return load
+
+# checks the files on every get
+@pytest.fixture
+def registry():
+    return ModelRegistry(check_interval=0)
+
+def write(path, content, mtime):
+    path.write_text(content)
+    os.utime(path, (mtime, mtime))
+
+
+def test_model_is_loaded_once(tmp_path, registry, loader, loads):
+    path = tmp_path / 'heart.pkl'
+    write(path, 'v1', 1_000_000)
+    registry.register('heart', str(path), loader)
+
+    first = registry.get('heart')
+    assert registry.model('heart') == 'v1'
+    assert registry.get('heart') is first
+    assert loads == [str(path)]
+
+def test_changed_file_is_hot_swapped(tmp_path, registry, loader, loads):
+    path = tmp_path / 'heart.pkl'
+    write(path, 'v1', 1_000_000)
+    registry.register('heart', str(path), loader)
+    first = registry.get('heart')
+
+    # touched but identical: re-hashed, not reloaded
+    write(path, 'v1', 1_000_100)
+    assert registry.get('heart') is first
+
+    write(path, 'v2', 1_000_200)
+    second = registry.get('heart')
+    assert second.model == 'v2'
+    assert second.version != first.version
+    assert len(loads) == 2
+
+def test_reload_skips_missing_artifacts(tmp_path, registry, loader, loads):
+    path = tmp_path / 'heart.pkl'
+    write(path, 'v1', 1_000_000)
+    registry.register('heart', str(path), loader)
+    registry.register('stroke', str(tmp_path / 'stroke.pkl'), loader)
+
+    info = registry.reload()
+    assert info['heart']['version'] == registry.get('heart').version
+    assert info['stroke'] == {'name': 'stroke', 'path': str(tmp_path / 'stroke.pkl'), 'loaded': False, 'available': False}
+    assert registry.reload('stroke')['stroke']['available'] is False
+    assert len(loads) == 1
+
+    # a loaded model whose file disappears keeps serving the version it has
+    os.remove(path)
+    assert registry.reload('heart')['heart']['version'] == info['heart']['version']
+
+def test_reload_of_unknown_model_raises(registry):
+    with pytest.raises(UnknownModel):
+        registry.reload('nope')
+
+def test_reload_route(mongo):
+    from index import app
+
+    client = app.test_client()
+    # the stroke and diabetes pickles are not in the tree
+    response = client.post('/models/reload', json={})
+    assert response.status_code == 200
+    assert response.get_json()['stroke']['available'] is False
+
+    response = client.post('/models/reload', json={'name': 'nope'})
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Unknown model: nope'}
@@ -0,0 +1,43 @@
+import pytest
+
+
+@pytest.fixture
+def client(mongo):
+    from index import app
+
+    mongo['patients'].insert_many([{'patient_id': f'P{i:02d}', 'staffs_assigned': ['S1']} for i in range(5)])
+    return app.test_client()
+
+
+@pytest.mark.parametrize('path', ['/patients/all', '/patients/staff/S1'])
+def test_listing_pages_with_limit(client, path):
+    response = client.get(f'{path}?limit=2&fields=patient_id')
+    assert response.status_code == 200
+    assert [p['patient_id'] for p in response.get_json()] == ['P00', 'P01']
+    assert response.headers['X-Next-Cursor'] == 'P01'
+
+    response = client.get(f'{path}?limit=2&after=P01')
+    assert [p['patient_id'] for p in response.get_json()] == ['P02', 'P03']
+
+
+@pytest.mark.parametrize('query', ['limit=abc', 'limit=1.5', 'limit=0', 'limit=1000000'])
+def test_listing_rejects_bad_limit(client, query):
+    response = client.get(f'/patients/all?{query}')
+    assert response.status_code == 400
+    assert 'limit' in response.get_json()['error']
+
+
+def test_trends_reject_bad_max_points(client):
+    assert client.get('/patients/P00/trends?max_points=50').status_code == 200
+    for value in ('abc', '1.5', '0'):
+        response = client.get(f'/patients/P00/trends?max_points={value}')
+        assert response.status_code == 400
+        assert 'max_points' in response.get_json()['error']
+
+
+def test_triage_rejects_bad_k(client):
+    assert client.get('/patients/triage?k=3').status_code == 200
+    for value in ('abc', '0', '1001'):
+        response = client.get(f'/patients/triage?k={value}')
+        assert response.status_code == 400
+        assert 'k must' in response.get_json()['error']
@@ -0,0 +1,112 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+load_dotenv()
+
+MONGO_URI = os.getenv('MONGO_URI')
+MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'dev-db')
+
+
+def env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+# Connection pool, timeouts and concerns of the shared client, all overridable through the
+# environment. Options that are not set are left to the driver (or the URI) to decide.
+def client_options():
+    options = {
+        'maxPoolSize': env_int('MONGO_MAX_POOL_SIZE', 50),
+        'minPoolSize': env_int('MONGO_MIN_POOL_SIZE', 0),
+        'maxIdleTimeMS': env_int('MONGO_MAX_IDLE_TIME_MS', 60000),
+        'connectTimeoutMS': env_int('MONGO_CONNECT_TIMEOUT_MS', 5000),
+        'serverSelectionTimeoutMS': env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+        'socketTimeoutMS': env_int('MONGO_SOCKET_TIMEOUT_MS', 30000),
+        'appname': os.getenv('MONGO_APP_NAME', 'medisynth-backend')
+    }
+    if os.getenv('MONGO_WRITE_CONCERN'):
+        w = os.getenv('MONGO_WRITE_CONCERN')
+        options['w'] = int(w) if w.isdigit() else w
+    if os.getenv('MONGO_READ_CONCERN'):
+        options['readConcernLevel'] = os.getenv('MONGO_READ_CONCERN')
+    if os.getenv('MONGO_READ_PREFERENCE'):
+        options['readPreference'] = os.getenv('MONGO_READ_PREFERENCE')
+    return options
+
+
+client = None
+client_lock = threading.RLock()
+# called with the default database right after the client is created, e.g. to create indexes
+connect_hooks = []
+
+def on_connect(hook):
+    connect_hooks.append(hook)
+    return hook
+
+# The one MongoClient of this process. It is created on first use, so importing a controller
+# (or a serverless cold start serving a route without the database) opens no connections.
+def get_client():
+    global client
+    if client is None:
+        with client_lock:
+            if client is None:
+                created = MongoClient(MONGO_URI, **client_options())
+                client = created
+                for hook in connect_hooks:
+                    try:
+                        hook(created[MONGO_DB_NAME])
+                    except Exception as e:
+                        print(f'Database connect hook {hook.__name__} failed: {e}')
+    return client
+
+def get_database(name=None):
+    return get_client()[name or MONGO_DB_NAME]
+
+# A forked child must not use the sockets of its parent's pool; it builds its own client on first
+# use instead. The parent's client is not closed here, it is still the parent's.
+def reset_client():
+    global client, client_lock
+    client = None
+    client_lock = threading.RLock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_client)
+
+
+# Stand-in for a pymongo Collection that resolves the real collection on every use, so modules
+# can keep `patient_collection = collection('patients')` at import time without connecting.
+class LazyCollection:
+    def __init__(self, name, database_name=None):
+        self.name = name
+        self.database_name = database_name
+
+    def resolve(self):
+        return get_database(self.database_name)[self.name]
+
+    def __getattr__(self, attribute):
+        return getattr(self.resolve(), attribute)
+
+    def __getitem__(self, key):
+        return self.resolve()[key]
+
+    def __repr__(self):
+        return f'LazyCollection({self.database_name or MONGO_DB_NAME}.{self.name})'
+
+def collection(name, database_name=None):
+    return LazyCollection(name, database_name)
+
+
+# Stand-in for the default database: db['patients'] gives a lazy collection
+class LazyDatabase:
+    def __init__(self, name=None):
+        self.name = name
+
+    def __getitem__(self, name):
+        return collection(name, self.name)
+
+    def __getattr__(self, attribute):
+        return getattr(get_database(self.name), attribute)
+
+db = LazyDatabase()
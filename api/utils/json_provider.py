@@ -0,0 +1,60 @@
+import os
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 'orjson' (the default when it is installed) or 'json' for the standard library encoder
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'orjson' if orjson else 'json')
+
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS
+    if orjson else 0
+)
+
+
+# Encodes MongoDB documents as they are read from the driver: ObjectId and Decimal128 become
+# strings while serializing, so responses need no conversion pass over the document first.
+# datetimes keep Flask's HTTP date format with either backend.
+class MongoJSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        if isinstance(o, ObjectId):
+            return str(o)
+        if isinstance(o, Decimal128):
+            return str(o.to_decimal())
+        return DefaultJSONProvider.default(o)
+
+    def use_orjson(self, kwargs):
+        # arguments such as indent are only understood by the standard library encoder
+        return JSON_BACKEND == 'orjson' and orjson is not None and not kwargs
+
+    def dumps_bytes(self, obj):
+        try:
+            return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # e.g. integers beyond 64 bits
+            return super().dumps(obj).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson(kwargs):
+            return self.dumps_bytes(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson(kwargs):
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if not self.use_orjson({}) or self._app.debug:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(self.dumps_bytes(self._prepare_response_obj(args, kwargs)), mimetype=self.mimetype)